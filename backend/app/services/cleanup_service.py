@@ -7,10 +7,12 @@
 """
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 from app.services.task_repository import TaskRepository, TaskNotFoundError
@@ -75,9 +77,11 @@ class CleanupService:
         self.s3_task_prefix = s3_task_prefix
         self.log_group_prefix = log_group_prefix
 
+        # CloudWatch Logs 按 API 动作限流，adaptive 模式在被限流时自动退避
         self.logs_client = logs_client or boto3.client(
             "logs",
             region_name=os.getenv("AWS_REGION", "us-west-2"),
+            config=Config(retries={"mode": "adaptive", "max_attempts": 5}),
         )
 
     def cleanup_expired_tasks(self, cutoff_date: Optional[datetime] = None) -> int:
@@ -96,6 +100,8 @@ class CleanupService:
 
         deleted_count = 0
         last_key = None
+        # 并发写入下分页可能出现重叠，记录已删除的任务避免重复的 DeleteItem 调用
+        deleted: set = set()
 
         try:
             while True:
@@ -110,8 +116,11 @@ class CleanupService:
                         task_created = task_created.replace(tzinfo=timezone.utc)
 
                     if task_created < cutoff_date:
+                        if task.task_id in deleted:
+                            continue
                         try:
                             self.task_repository.delete_task(task.task_id)
+                            deleted.add(task.task_id)
                             deleted_count += 1
                             logger.info(f"Deleted expired task: {task.task_id}")
                         except TaskNotFoundError:
@@ -230,33 +239,79 @@ class CleanupService:
             int: 删除的日志流数量
         """
         deleted_count = 0
+        next_token = None
 
         try:
-            paginator = self.logs_client.get_paginator("describe_log_streams")
-            for page in paginator.paginate(
-                logGroupName=log_group_name,
-                orderBy="LastEventTime",
-            ):
-                for stream in page.get("logStreams", []):
-                    last_event = stream.get("lastEventTimestamp", 0)
-                    if last_event > 0 and last_event < cutoff_ms:
-                        try:
-                            self.logs_client.delete_log_stream(
-                                logGroupName=log_group_name,
-                                logStreamName=stream["logStreamName"],
-                            )
-                            deleted_count += 1
-                        except Exception as e:
-                            logger.error(
-                                f"Failed to delete log stream "
-                                f"{stream['logStreamName']}: {e}"
-                            )
+            while True:
+                # 按 LastEventTime 升序每次取 50 条，最旧的流排在最前面
+                kwargs = {
+                    "logGroupName": log_group_name,
+                    "orderBy": "LastEventTime",
+                    "descending": False,
+                    "limit": 50,
+                }
+                if next_token:
+                    kwargs["nextToken"] = next_token
+
+                response = self.logs_client.describe_log_streams(**kwargs)
+                streams = response.get("logStreams", [])
+
+                expired = [
+                    s
+                    for s in streams
+                    if 0 < s.get("lastEventTimestamp", 0) < cutoff_ms
+                ]
+                deleted_count += self._delete_log_streams(log_group_name, expired)
+
+                # 升序排列下，本页一旦出现未过期的流，后续页只会更新，提前结束分页
+                has_recent = any(
+                    s.get("lastEventTimestamp", 0) >= cutoff_ms for s in streams
+                )
+                next_token = response.get("nextToken")
+                if has_recent or not next_token:
+                    break
 
         except Exception as e:
             logger.error(f"Error cleaning log streams for {log_group_name}: {e}")
 
         return deleted_count
 
+    def _delete_log_streams(self, log_group_name: str, streams: List[Dict]) -> int:
+        """
+        并行删除一批日志流
+
+        Args:
+            log_group_name: 日志组名称
+            streams: 待删除的日志流列表
+
+        Returns:
+            int: 成功删除的日志流数量
+        """
+        if not streams:
+            return 0
+
+        deleted_count = 0
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = {
+                executor.submit(
+                    self.logs_client.delete_log_stream,
+                    logGroupName=log_group_name,
+                    logStreamName=stream["logStreamName"],
+                ): stream["logStreamName"]
+                for stream in streams
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    deleted_count += 1
+                except Exception as e:
+                    logger.error(
+                        f"Failed to delete log stream {futures[future]}: {e}"
+                    )
+
+        return deleted_count
+
     def run_full_cleanup(self) -> CleanupResult:
         """
         执行完整的资源清理
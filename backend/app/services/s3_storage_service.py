@@ -1,11 +1,18 @@
 """
 S3 Storage Service for managing file uploads, downloads, and presigned URLs.
 """
+import functools
 import os
 import logging
-from typing import Optional, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, List, Tuple
 from datetime import datetime, timedelta
 import boto3
+from boto3.s3.transfer import TransferConfig
+from cachetools import TTLCache
+from botocore.config import Config
 from botocore.exceptions import ClientError, BotoCoreError
 
 logger = logging.getLogger(__name__)
@@ -31,13 +38,39 @@ class S3StorageService:
         self.bucket_name = bucket_name
         self.region = region
         
-        # Create S3 client
+        # Create S3 client with a widened connection pool so thread-pooled
+        # uploads/downloads don't serialize on the default 10 sockets
         self.s3_client = boto3.client(
             's3',
             region_name=region,
-            endpoint_url=endpoint_url
+            endpoint_url=endpoint_url,
+            config=Config(
+                max_pool_connections=64,
+                retries={'max_attempts': 3, 'mode': 'adaptive'},
+                tcp_keepalive=True
+            )
         )
         
+        # Multipart kicks in above 8 MiB, streaming parts concurrently
+        # instead of buffering whole files
+        self._transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=8 * 1024 * 1024,
+            max_concurrency=8,
+            use_threads=True
+        )
+
+        # Short-lived HEAD cache: repeated existence/size checks on the same
+        # key within the TTL don't re-issue head_object. TTLCache is not
+        # thread-safe and bulk uploads invalidate it from worker threads,
+        # so every access takes the lock
+        self._head_cache = TTLCache(maxsize=10_000, ttl=30)
+        self._head_cache_lock = threading.Lock()
+
+        # Per-instance LRU over the SigV4 signing work; keyed by time window
+        # so identical URLs are reused (and browser-cacheable) within it
+        self._signed = functools.lru_cache(maxsize=1024)(self._sign)
+
         logger.info(f"Initialized S3StorageService for bucket: {bucket_name}")
     
     def upload_file(
@@ -74,18 +107,90 @@ class S3StorageService:
                 local_path,
                 self.bucket_name,
                 s3_key,
-                ExtraArgs=extra_args
+                ExtraArgs=extra_args,
+                Config=self._transfer_config
             )
             
+            with self._head_cache_lock:
+                self._head_cache.pop(s3_key, None)
+
             s3_url = f"s3://{self.bucket_name}/{s3_key}"
             logger.info(f"Uploaded file to {s3_url}")
-            
+
             return s3_url
             
         except ClientError as e:
             logger.error(f"Failed to upload file to S3: {e}")
             raise
     
+    def upload_files_bulk(
+        self,
+        items: Iterable[Tuple[str, str]],
+        max_workers: int = 16
+    ) -> List[str]:
+        """
+        Upload multiple files to S3 in parallel over the shared client.
+
+        Args:
+            items: Iterable of (local_path, s3_key) pairs
+            max_workers: Number of concurrent uploads (default: 16)
+
+        Returns:
+            List of S3 URLs in the same order as items
+
+        Raises:
+            FileNotFoundError: If any local file doesn't exist
+            ClientError: If any S3 upload fails
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda p: self.upload_file(*p), items))
+
+    def upload_file_obj(
+        self,
+        fileobj,
+        s3_key: str,
+        metadata: Optional[dict] = None
+    ) -> str:
+        """
+        Upload a file-like object to S3 without touching the filesystem.
+
+        Args:
+            fileobj: Binary file-like object (e.g., io.BytesIO)
+            s3_key: S3 object key (path in bucket)
+            metadata: Optional metadata to attach to the object
+
+        Returns:
+            S3 URL of the uploaded file
+
+        Raises:
+            ClientError: If S3 upload fails
+        """
+        try:
+            extra_args = {}
+            if metadata:
+                extra_args['Metadata'] = metadata
+
+            # Upload stream
+            self.s3_client.upload_fileobj(
+                fileobj,
+                self.bucket_name,
+                s3_key,
+                ExtraArgs=extra_args,
+                Config=self._transfer_config
+            )
+
+            with self._head_cache_lock:
+                self._head_cache.pop(s3_key, None)
+
+            s3_url = f"s3://{self.bucket_name}/{s3_key}"
+            logger.info(f"Uploaded stream to {s3_url}")
+
+            return s3_url
+
+        except ClientError as e:
+            logger.error(f"Failed to upload stream to S3: {e}")
+            raise
+
     def download_file(
         self,
         s3_key: str,
@@ -139,27 +244,41 @@ class S3StorageService:
             
         Returns:
             Presigned URL
-            
+
         Raises:
             ClientError: If URL generation fails
         """
         try:
-            url = self.s3_client.generate_presigned_url(
-                http_method,
-                Params={
-                    'Bucket': self.bucket_name,
-                    'Key': s3_key
-                },
-                ExpiresIn=expiration
-            )
-            
+            # Floor the sign time to a window (1/12 of the expiration) so
+            # repeated calls within the window hit the cache and return the
+            # identical URL instead of re-running the SigV4 HMAC work
+            window = int(time.time() // max(expiration // 12, 1))
+            url = self._signed(s3_key, window, expiration, http_method)
+
             logger.info(f"Generated presigned URL for {s3_key} (expires in {expiration}s)")
-            
+
             return url
-            
+
         except ClientError as e:
             logger.error(f"Failed to generate presigned URL: {e}")
             raise
+
+    def _sign(
+        self,
+        s3_key: str,
+        window: int,
+        expiration: int,
+        http_method: str
+    ) -> str:
+        """Run the actual presigned-URL signing (cached by generate_presigned_url)."""
+        return self.s3_client.generate_presigned_url(
+            http_method,
+            Params={
+                'Bucket': self.bucket_name,
+                'Key': s3_key
+            },
+            ExpiresIn=expiration
+        )
     
     def delete_file(self, s3_key: str) -> bool:
         """
@@ -179,7 +298,10 @@ class S3StorageService:
                 Bucket=self.bucket_name,
                 Key=s3_key
             )
-            
+
+            with self._head_cache_lock:
+                self._head_cache.pop(s3_key, None)
+
             logger.info(f"Deleted file: s3://{self.bucket_name}/{s3_key}")
             
             return True
@@ -207,21 +329,28 @@ class S3StorageService:
             ClientError: If S3 list operation fails
         """
         try:
-            response = self.s3_client.list_objects_v2(
+            # Paginate instead of a single list_objects_v2 call so listings
+            # beyond one page are streamed rather than silently truncated
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            pages = paginator.paginate(
                 Bucket=self.bucket_name,
                 Prefix=prefix,
-                MaxKeys=max_keys
+                PaginationConfig={
+                    'MaxItems': max_keys,
+                    'PageSize': min(1000, max_keys)
+                }
             )
-            
-            if 'Contents' not in response:
-                return []
-            
-            keys = [obj['Key'] for obj in response['Contents']]
-            
+
+            keys = [
+                obj['Key']
+                for page in pages
+                for obj in page.get('Contents', [])
+            ]
+
             logger.info(f"Listed {len(keys)} files with prefix: {prefix}")
-            
+
             return keys
-            
+
         except ClientError as e:
             logger.error(f"Failed to list files from S3: {e}")
             raise
@@ -236,14 +365,23 @@ class S3StorageService:
         Returns:
             True if file exists, False otherwise
         """
+        with self._head_cache_lock:
+            cached = self._head_cache.get(s3_key)
+        if cached is not None:
+            return cached is not False
+
         try:
-            self.s3_client.head_object(
+            response = self.s3_client.head_object(
                 Bucket=self.bucket_name,
                 Key=s3_key
             )
+            with self._head_cache_lock:
+                self._head_cache[s3_key] = response['ContentLength']
             return True
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
+                with self._head_cache_lock:
+                    self._head_cache[s3_key] = False
                 return False
             raise
     
@@ -260,12 +398,21 @@ class S3StorageService:
         Raises:
             ClientError: If file doesn't exist or operation fails
         """
+        # False (cached 404) is an int subclass, so exclude it explicitly
+        with self._head_cache_lock:
+            cached = self._head_cache.get(s3_key)
+        if cached is not None and cached is not False:
+            return cached
+
         try:
             response = self.s3_client.head_object(
                 Bucket=self.bucket_name,
                 Key=s3_key
             )
-            return response['ContentLength']
+            size = response['ContentLength']
+            with self._head_cache_lock:
+                self._head_cache[s3_key] = size
+            return size
         except ClientError as e:
             logger.error(f"Failed to get file size: {e}")
             raise
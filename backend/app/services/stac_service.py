@@ -7,8 +7,10 @@ STAC API 查询服务
 - Landsat 8: Collection 2 Level-1, Level-2
 - MODIS: Terra/Aqua 反射率及植被产品
 """
+import functools
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import numpy as np
 from pystac_client import Client
 from pystac import Item
 import logging
@@ -63,14 +65,13 @@ class STACQueryService:
             stac_url: STAC API 端点 URL
         """
         self.stac_url = stac_url
-        self.client = None
-        
-    def _get_client(self) -> Client:
-        """获取或创建 STAC 客户端"""
-        if self.client is None:
-            self.client = Client.open(self.stac_url)
-        return self.client
-    
+
+    @functools.cached_property
+    def _client(self) -> Client:
+        """STAC 客户端（首次访问时创建，之后直接走实例字典）"""
+        return Client.open(self.stac_url)
+
+
     def _geojson_to_bbox(self, geojson: Dict[str, Any]) -> List[float]:
         """
         将 GeoJSON 转换为 bbox
@@ -81,10 +82,11 @@ class STACQueryService:
         Returns:
             bbox: [minx, miny, maxx, maxy]
         """
-        coords = geojson["coordinates"][0]  # 获取外环坐标
-        lons = [coord[0] for coord in coords]
-        lats = [coord[1] for coord in coords]
-        return [min(lons), min(lats), max(lons), max(lats)]
+        # 获取外环坐标，向量化求 min/max（顶点多的 AOI 明显快于 Python 循环）
+        coords = np.asarray(geojson["coordinates"][0], dtype=np.float64)
+        mn = coords.min(axis=0)
+        mx = coords.max(axis=0)
+        return [float(mn[0]), float(mn[1]), float(mx[0]), float(mx[1])]
     
     def search_sentinel2(
         self,
@@ -106,7 +108,7 @@ class STACQueryService:
             STAC Item 列表
         """
         try:
-            client = self._get_client()
+            client = self._client
             bbox = self._geojson_to_bbox(aoi)
             
             collection = SENTINEL2_COLLECTIONS.get(
@@ -159,7 +161,7 @@ class STACQueryService:
             STAC Item 列表
         """
         try:
-            client = self._get_client()
+            client = self._client
             bbox = self._geojson_to_bbox(aoi)
             
             collection = SENTINEL1_COLLECTIONS.get(
@@ -211,7 +213,7 @@ class STACQueryService:
             STAC Item 列表
         """
         try:
-            client = self._get_client()
+            client = self._client
             bbox = self._geojson_to_bbox(aoi)
             
             collection = LANDSAT8_COLLECTIONS.get(
@@ -269,7 +271,7 @@ class STACQueryService:
             STAC Item 列表
         """
         try:
-            client = self._get_client()
+            client = self._client
             bbox = self._geojson_to_bbox(aoi)
             
             collection = MODIS_COLLECTIONS.get(
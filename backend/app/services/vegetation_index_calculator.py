@@ -11,6 +11,54 @@
 import numpy as np
 from typing import Optional
 
+from app.services import vegetation_index_calculator_numba as _kernels
+from app.services.vegetation_index_calculator_numba import NUMBA_AVAILABLE
+
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+
+def _division_dtype(*arrays: np.ndarray) -> np.dtype:
+    """除法输出缓冲区的 dtype
+
+    浮点波段保持原精度；整型波段（卫星 DN 常见 uint16）升为 float64，
+    与 numpy 真除法的提升规则一致——整型缓冲区会让 np.divide 直接报错。
+    """
+    dtype = np.result_type(*arrays)
+    return dtype if np.issubdtype(dtype, np.floating) else np.dtype(np.float64)
+
+
+def _numexpr_usable(*arrays: np.ndarray) -> bool:
+    """判断能否走 numexpr 回退
+
+    只接收 float64 数组：numexpr 把字面量当 float64，会悄悄把
+    float32 波段升格成 float64 输出，破坏 dtype 保持约定。
+    """
+    return NUMEXPR_AVAILABLE and all(
+        isinstance(a, np.ndarray) and a.dtype == np.float64 for a in arrays
+    )
+
+
+def _kernel_usable(*arrays: np.ndarray) -> bool:
+    """判断能否走 numba 融合内核
+
+    要求 numba 可用，且所有波段是同形状、C 连续的浮点数组——
+    这样 ravel() 只返回视图，内核在扁平视图上单趟完成计算。
+    """
+    if not NUMBA_AVAILABLE:
+        return False
+    first = arrays[0]
+    return all(
+        isinstance(a, np.ndarray)
+        and np.issubdtype(a.dtype, np.floating)
+        and a.flags.c_contiguous
+        and a.shape == first.shape
+        for a in arrays
+    )
+
 
 class VegetationIndexCalculator:
     """
@@ -18,45 +66,133 @@ class VegetationIndexCalculator:
     
     提供多种植被指数的计算方法，用于评估植被健康状况和覆盖度。
     所有方法都接受 numpy 数组作为输入，并返回计算后的指数数组。
+    各 calculate_* 方法支持可选的 out= 预分配缓冲区；
+    循环处理同形状影像时配合 get_buffer 复用，消除每次调用的输出分配。
     """
-    
-    def calculate_ndvi(self, nir: np.ndarray, red: np.ndarray) -> np.ndarray:
+
+    def __init__(self):
+        # (shape, dtype) -> 可复用的输出缓冲区
+        self._buffers = {}
+
+    def get_buffer(self, shape, dtype=np.float64) -> np.ndarray:
+        """
+        获取（并缓存）一块指定形状与 dtype 的输出缓冲区
+
+        同一 (shape, dtype) 只分配一次，适合作为 calculate_* 的 out= 参数
+        在循环中复用。缓冲区内容不保证清零。
+
+        参数:
+            shape: 缓冲区形状
+            dtype: 缓冲区元素类型，默认 float64
+
+        返回:
+            可复用的 numpy 数组
+        """
+        key = (tuple(shape), np.dtype(dtype))
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = np.empty(key[0], dtype=key[1])
+            self._buffers[key] = buffer
+        return buffer
+
+    def clear_buffers(self) -> None:
+        """释放全部缓存的输出缓冲区"""
+        self._buffers.clear()
+
+    def calculate_ndvi(
+        self,
+        nir: np.ndarray,
+        red: np.ndarray,
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """
         计算归一化植被指数 (NDVI)
-        
+
         公式: NDVI = (NIR - Red) / (NIR + Red)
-        
+
         NDVI 是最常用的植被指数，用于评估植被的生长状态和覆盖度。
         值范围通常在 -1 到 1 之间，其中：
         - 负值通常表示水体
         - 接近 0 表示裸土或建筑
         - 正值表示植被，值越高植被越茂盛
-        
+
         参数:
             nir: 近红外波段数据 (numpy 数组)
             red: 红光波段数据 (numpy 数组)
-            
+            out: 可选的预分配输出缓冲区（与输入同形状），
+                 流水线循环调用时可复用，避免每次都新分配结果数组
+
         返回:
             NDVI 计算结果 (numpy 数组)
-            
+
         验证: 需求 5.2
         """
-        # 避免除零错误，使用 numpy 的 divide 函数
-        # 当分母为 0 时，返回 0
+        # 标量快路径：纯 Python 算术，绕开 ufunc 派发开销
+        if np.isscalar(nir) and np.isscalar(red):
+            denominator = nir + red
+            return 0.0 if denominator == 0 else (nir - red) / denominator
+
+        if _kernel_usable(nir, red) and (out is None or _kernel_usable(nir, out)):
+            if out is None:
+                out = np.empty_like(nir)
+            _kernels.ndvi_kernel(nir.ravel(), red.ravel(), out.ravel())
+            return out
+
+        # 内核条件不满足（非连续、形状需广播等）时退到逐元素 ufunc：
+        # 仍然单趟完成除零保护与除法，且走 numpy 的标准广播派发
+        if NUMBA_AVAILABLE:
+            if out is None:
+                return _kernels.ndvi_ufunc(nir, red)
+            return _kernels.ndvi_ufunc(nir, red, out)
+
+        # numpy 回退路径
         denominator = nir + red
-        with np.errstate(divide='ignore', invalid='ignore'):
-            ndvi = np.where(
-                denominator != 0,
-                (nir - red) / denominator,
-                0
-            )
-        return ndvi
+        # 干净影像快路径：大数组先做一次归约扫描，没有零分母就直接整除，
+        # 省掉掩码计算；阈值用于摊销小数组上 np.any 的开销
+        if denominator.size > 1024 and not np.any(denominator == 0):
+            if out is None:
+                return (nir - red) / denominator
+            np.subtract(nir, red, out=out)
+            np.divide(out, denominator, out=out)
+            return out
+
+        # 安全路径：where= 让除法根本不在零分母通道上执行，
+        # 无需 errstate 压警告，也省掉 np.where 的整数组掩码套用
+        valid = denominator != 0
+        if out is None:
+            out = np.empty_like(denominator, dtype=_division_dtype(denominator))
+        np.subtract(nir, red, out=out)
+        np.divide(out, denominator, out=out, where=valid)
+        out[~valid] = 0
+        return out
     
+    def calculate_ndvi_fast(self, nir: np.ndarray, red: np.ndarray) -> np.ndarray:
+        """
+        NDVI 的 numba JIT 加速变体
+
+        强制走融合内核（已在模块导入时预热），不经过 calculate_ndvi
+        的启发式派发；numba 不可用或输入不满足内核条件
+        （非连续、非浮点、形状不一致）时显式回退到 calculate_ndvi。
+
+        参数:
+            nir: 近红外波段数据 (numpy 数组)
+            red: 红光波段数据 (numpy 数组)
+
+        返回:
+            NDVI 计算结果 (numpy 数组)
+        """
+        if _kernel_usable(nir, red):
+            out = np.empty_like(nir)
+            _kernels.ndvi_kernel(nir.ravel(), red.ravel(), out.ravel())
+            return out
+        return self.calculate_ndvi(nir, red)
+
     def calculate_savi(
-        self, 
-        nir: np.ndarray, 
-        red: np.ndarray, 
-        L: float = 0.5
+        self,
+        nir: np.ndarray,
+        red: np.ndarray,
+        L: float = 0.5,
+        out: Optional[np.ndarray] = None
     ) -> np.ndarray:
         """
         计算土壤调节植被指数 (SAVI)
@@ -73,27 +209,52 @@ class VegetationIndexCalculator:
                - L = 0: 高植被覆盖度
                - L = 0.5: 中等植被覆盖度
                - L = 1: 低植被覆盖度
-            
+            out: 可选的预分配输出缓冲区（与输入同形状）
+
         返回:
             SAVI 计算结果 (numpy 数组)
-            
+
         验证: 需求 5.3
         """
-        # 避免除零错误
+        # 标量快路径
+        if np.isscalar(nir) and np.isscalar(red):
+            denominator = nir + red + L
+            return 0.0 if denominator == 0 else (1 + L) * (nir - red) / denominator
+
+        if _kernel_usable(nir, red) and (out is None or _kernel_usable(nir, out)):
+            if out is None:
+                out = np.empty_like(nir)
+            _kernels.savi_kernel(nir.ravel(), red.ravel(), L, out.ravel())
+            return out
+
+        # numexpr 回退：表达式单趟分块求值，无完整中间数组；
+        # numexpr 对零分母给 inf/nan，只清零分母为 0 的通道，
+        # 输入里的 NaN（如 nodata）照常传播，与内核/numpy 路径一致
+        if _numexpr_usable(nir, red) and out is None:
+            denominator = ne.evaluate("nir + red + L")
+            result = ne.evaluate("(1.0 + L) * (nir - red) / denominator")
+            result[denominator == 0] = 0
+            return result
+
+        # numpy 回退路径：零分母通道保持预置的 0，不执行除法
         denominator = nir + red + L
-        with np.errstate(divide='ignore', invalid='ignore'):
-            savi = np.where(
-                denominator != 0,
-                (1 + L) * (nir - red) / denominator,
-                0
-            )
-        return savi
+        if out is None:
+            out = np.zeros_like(denominator)
+        else:
+            out.fill(0)
+        return np.divide(
+            (1 + L) * (nir - red),
+            denominator,
+            out=out,
+            where=denominator != 0
+        )
     
     def calculate_evi(
-        self, 
-        nir: np.ndarray, 
-        red: np.ndarray, 
-        blue: np.ndarray
+        self,
+        nir: np.ndarray,
+        red: np.ndarray,
+        blue: np.ndarray,
+        out: Optional[np.ndarray] = None
     ) -> np.ndarray:
         """
         计算增强植被指数 (EVI)
@@ -107,23 +268,163 @@ class VegetationIndexCalculator:
             nir: 近红外波段数据 (numpy 数组)
             red: 红光波段数据 (numpy 数组)
             blue: 蓝光波段数据 (numpy 数组)
-            
+            out: 可选的预分配输出缓冲区（与输入同形状）
+
         返回:
             EVI 计算结果 (numpy 数组)
-            
+
         验证: 需求 5.4
         """
-        # 避免除零错误
-        denominator = nir + 6 * red - 7.5 * blue + 1
-        with np.errstate(divide='ignore', invalid='ignore'):
-            evi = np.where(
-                denominator != 0,
-                2.5 * (nir - red) / denominator,
-                0
+        # 标量快路径
+        if np.isscalar(nir) and np.isscalar(red) and np.isscalar(blue):
+            denominator = nir + 6 * red - 7.5 * blue + 1
+            return 0.0 if denominator == 0 else 2.5 * (nir - red) / denominator
+
+        if (_kernel_usable(nir, red, blue)
+                and (out is None or _kernel_usable(nir, out))):
+            if out is None:
+                out = np.empty_like(nir)
+            _kernels.evi_kernel(
+                nir.ravel(), red.ravel(), blue.ravel(), out.ravel()
             )
-        return evi
+            return out
+
+        # numexpr 回退：同 SAVI，只清零分母为 0 的通道，NaN 照常传播
+        if _numexpr_usable(nir, red, blue) and out is None:
+            denominator = ne.evaluate("nir + 6.0 * red - 7.5 * blue + 1.0")
+            result = ne.evaluate("2.5 * (nir - red) / denominator")
+            result[denominator == 0] = 0
+            return result
+
+        # numpy 回退路径：零分母通道保持预置的 0，不执行除法
+        denominator = nir + 6 * red - 7.5 * blue + 1
+        if out is None:
+            out = np.zeros_like(denominator)
+        else:
+            out.fill(0)
+        return np.divide(
+            2.5 * (nir - red),
+            denominator,
+            out=out,
+            where=denominator != 0
+        )
     
-    def calculate_vgi(self, green: np.ndarray, red: np.ndarray) -> np.ndarray:
+    def calculate_ndvi_and_savi(
+        self,
+        nir: np.ndarray,
+        red: np.ndarray,
+        L: float = 0.5
+    ) -> tuple:
+        """
+        单趟同时计算 NDVI 与 SAVI
+
+        两个指数共享 (NIR - Red) 与 (NIR + Red) 中间量，
+        波段对只从内存读取一次；下游分析常同时需要这两个指数。
+
+        参数:
+            nir: 近红外波段数据 (numpy 数组)
+            red: 红光波段数据 (numpy 数组)
+            L: SAVI 的土壤调节因子，默认为 0.5
+
+        返回:
+            (ndvi, savi) 元组
+        """
+        diff = nir - red
+        band_sum = nir + red
+        dtype = _division_dtype(band_sum)
+        ndvi = np.divide(
+            diff,
+            band_sum,
+            out=np.zeros_like(band_sum, dtype=dtype),
+            where=band_sum != 0
+        )
+        denominator_savi = band_sum + L
+        savi = np.divide(
+            (1 + L) * diff,
+            denominator_savi,
+            out=np.zeros_like(band_sum, dtype=dtype),
+            where=denominator_savi != 0
+        )
+        return ndvi, savi
+
+    def calculate_all(
+        self,
+        nir: np.ndarray,
+        red: np.ndarray,
+        green: Optional[np.ndarray] = None,
+        blue: Optional[np.ndarray] = None
+    ) -> dict:
+        """
+        一次计算全部植被指数
+
+        内核可用时逐指数走 numba 融合内核（每个指数单趟完成）；
+        否则退到共享中间量的单趟 numpy 实现：输入波段只读取一次，
+        (NIR - Red) 等中间量在各公式间复用，减少内存遍历次数。
+
+        参数:
+            nir: 近红外波段数据 (numpy 数组)
+            red: 红光波段数据 (numpy 数组)
+            green: 绿光波段数据（可选，缺省时不计算 VGI）
+            blue: 蓝光波段数据（可选，缺省时不计算 EVI）
+
+        返回:
+            dict: 键为 "ndvi"/"savi"，以及按输入提供的 "evi"/"vgi"
+        """
+        bands = [a for a in (nir, red, green, blue) if a is not None]
+        if _kernel_usable(*bands):
+            results = {
+                "ndvi": self.calculate_ndvi(nir, red),
+                "savi": self.calculate_savi(nir, red),
+            }
+            if blue is not None:
+                results["evi"] = self.calculate_evi(nir, red, blue)
+            if green is not None:
+                results["vgi"] = self.calculate_vgi(green, red)
+            return results
+
+        diff = nir - red
+        results = {}
+        denominator = nir + red
+        results["ndvi"] = np.divide(
+            diff,
+            denominator,
+            out=np.zeros_like(denominator, dtype=_division_dtype(denominator)),
+            where=denominator != 0
+        )
+
+        denominator_savi = denominator + 0.5
+        results["savi"] = np.divide(
+            1.5 * diff,
+            denominator_savi,
+            out=np.zeros_like(denominator_savi),
+            where=denominator_savi != 0
+        )
+
+        if blue is not None:
+            denominator_evi = nir + 6 * red - 7.5 * blue + 1
+            results["evi"] = np.divide(
+                2.5 * diff,
+                denominator_evi,
+                out=np.zeros_like(denominator_evi),
+                where=denominator_evi != 0
+            )
+
+        if green is not None:
+            results["vgi"] = np.divide(
+                green,
+                red,
+                out=np.zeros_like(green, dtype=_division_dtype(green, red)),
+                where=red != 0
+            )
+
+        return results
+
+    def calculate_vgi(
+        self,
+        green: np.ndarray,
+        red: np.ndarray,
+        out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """
         计算植被绿度指数 (VGI)
         
@@ -135,17 +436,37 @@ class VegetationIndexCalculator:
         参数:
             green: 绿光波段数据 (numpy 数组)
             red: 红光波段数据 (numpy 数组)
-            
+            out: 可选的预分配输出缓冲区（与输入同形状）
+
         返回:
             VGI 计算结果 (numpy 数组)
-            
+
         验证: 需求 5.6
         """
-        # 避免除零错误
-        with np.errstate(divide='ignore', invalid='ignore'):
-            vgi = np.where(
-                red != 0,
-                green / red,
-                0
-            )
-        return vgi
+        # 标量快路径
+        if np.isscalar(green) and np.isscalar(red):
+            return 0.0 if red == 0 else green / red
+
+        if (_kernel_usable(green, red)
+                and (out is None or _kernel_usable(green, out))):
+            if out is None:
+                out = np.empty_like(green)
+            _kernels.vgi_kernel(green.ravel(), red.ravel(), out.ravel())
+            return out
+
+        # numpy 回退路径；大数组且红光无零值时走无掩码的快路径
+        if red.size > 1024 and not np.any(red == 0):
+            if out is None:
+                return green / red
+            return np.divide(green, red, out=out)
+
+        if out is None:
+            out = np.zeros_like(green, dtype=_division_dtype(green, red))
+        else:
+            out.fill(0)
+        return np.divide(
+            green,
+            red,
+            out=out,
+            where=red != 0
+        )
@@ -0,0 +1,97 @@
+"""
+共享测试 fixture
+"""
+import os
+
+import httpx
+import pytest
+from asgi_lifespan import LifespanManager
+from fastapi.testclient import TestClient
+
+# 让 tmp_path/tmp_path_factory 落在内存盘上，测试写的小文件不经过磁盘
+if os.path.isdir("/dev/shm"):
+    os.environ.setdefault("PYTEST_DEBUG_TEMPROOT", "/dev/shm")
+
+
+def pytest_addoption(parser):
+    """--runperf: 显式运行大数组性能测试（默认跳过）"""
+    parser.addoption(
+        "--runperf",
+        action="store_true",
+        default=False,
+        help="运行 perf 标记的性能测试",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """默认跳过 perf 标记的测试，除非传入 --runperf"""
+    if config.getoption("--runperf"):
+        return
+    skip_perf = pytest.mark.skip(reason="需要 --runperf 才运行性能测试")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip_perf)
+
+
+@pytest.fixture(scope="session")
+def std_polygon_coords():
+    """标准测试多边形坐标（各测试模块共享，只读）"""
+    return [[
+        [116.3, 39.9],
+        [116.4, 39.9],
+        [116.4, 40.0],
+        [116.3, 40.0],
+        [116.3, 39.9],
+    ]]
+
+
+@pytest.fixture(scope="session")
+def std_aoi_dict(std_polygon_coords):
+    """标准测试 AOI（GeoJSON dict 形式）"""
+    return {"type": "Polygon", "coordinates": std_polygon_coords}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _gdal_session_env():
+    """会话级 GDAL 配置，每个 xdist worker 只设置一次。
+
+    整个会话保持同一个 rasterio.Env 打开，
+    避免每次 rasterio.open 都重新 push/pop GDAL 配置环境。
+    """
+    os.environ.setdefault("GDAL_DISABLE_READDIR_ON_OPEN", "EMPTY_DIR")
+    os.environ.setdefault("GDAL_CACHEMAX", "64")
+    if os.path.isdir("/dev/shm"):
+        os.environ.setdefault("CPL_TMPDIR", "/dev/shm")
+
+    try:
+        import rasterio
+    except ImportError:
+        yield
+        return
+
+    with rasterio.Env(
+        GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR",
+        GDAL_CACHEMAX=64,
+    ):
+        yield
+
+
+@pytest.fixture(scope="session")
+def client():
+    """会话级 FastAPI 测试客户端，整个测试会话只构建一次应用"""
+    from main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+async def aclient():
+    """异步测试客户端：请求留在事件循环内，省去 TestClient 的线程跳转"""
+    from main import app
+
+    async with LifespanManager(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as c:
+            yield c
@@ -8,6 +8,8 @@ import pytest
 from datetime import datetime, timedelta, timezone
 from unittest.mock import Mock, patch, MagicMock, call
 
+from freezegun import freeze_time
+
 from app.services.cleanup_service import CleanupService, CleanupResult
 from app.services.task_repository import TaskNotFoundError
 from app.models.processing import ProcessingTask
@@ -48,16 +50,31 @@ def cleanup_service(mock_task_repository, mock_s3_service, mock_logs_client):
     )
 
 
+# 冻结的"当前时间"，与 @freeze_time 保持一致，避免每个测试重复调用 datetime.now()
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+# 共享的任务模板：model_construct 跳过字段校验，
+# _make_task 只做 model_copy，避免每个任务都走一遍 Pydantic 校验
+_BASE_TASK = ProcessingTask.model_construct(
+    task_id="",
+    task_type="indices",
+    status="completed",
+    progress=100,
+    created_at=NOW,
+    updated_at=NOW,
+    parameters={},
+)
+
+
 def _make_task(task_id: str, created_at: datetime) -> ProcessingTask:
     """创建测试用任务"""
-    return ProcessingTask(
-        task_id=task_id,
-        task_type="indices",
-        status="completed",
-        progress=100,
-        created_at=created_at,
-        updated_at=created_at,
-        parameters={},
+    return _BASE_TASK.model_copy(
+        update={
+            "task_id": task_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
     )
 
 
@@ -91,14 +108,14 @@ class TestCleanupResult:
         assert len(d["errors"]) == 1
 
 
+@freeze_time("2024-06-01")
 class TestCleanupExpiredTasks:
     """测试任务记录清理"""
 
     def test_deletes_old_tasks(self, cleanup_service, mock_task_repository):
         """过期任务应被删除"""
-        now = datetime.now(timezone.utc)
-        old_task = _make_task("task_old", now - timedelta(days=45))
-        recent_task = _make_task("task_recent", now - timedelta(days=5))
+        old_task = _make_task("task_old", NOW - timedelta(days=45))
+        recent_task = _make_task("task_recent", NOW - timedelta(days=5))
 
         mock_task_repository.list_tasks.return_value = (
             [old_task, recent_task],
@@ -113,8 +130,7 @@ class TestCleanupExpiredTasks:
 
     def test_no_tasks_to_delete(self, cleanup_service, mock_task_repository):
         """没有过期任务时返回 0"""
-        now = datetime.now(timezone.utc)
-        recent = _make_task("task_1", now - timedelta(days=1))
+        recent = _make_task("task_1", NOW - timedelta(days=1))
 
         mock_task_repository.list_tasks.return_value = ([recent], None)
 
@@ -125,9 +141,8 @@ class TestCleanupExpiredTasks:
 
     def test_handles_pagination(self, cleanup_service, mock_task_repository):
         """分页场景下应清理所有过期任务"""
-        now = datetime.now(timezone.utc)
-        old1 = _make_task("task_old1", now - timedelta(days=60))
-        old2 = _make_task("task_old2", now - timedelta(days=90))
+        old1 = _make_task("task_old1", NOW - timedelta(days=60))
+        old2 = _make_task("task_old2", NOW - timedelta(days=90))
 
         page_key = {"task_id": "task_old1"}
         mock_task_repository.list_tasks.side_effect = [
@@ -140,10 +155,25 @@ class TestCleanupExpiredTasks:
 
         assert count == 2
 
+    def test_deduplicates_overlapping_pages(self, cleanup_service, mock_task_repository):
+        """分页重叠时同一任务只应删除一次"""
+        old = _make_task("task_old", NOW - timedelta(days=60))
+
+        page_key = {"task_id": "task_old"}
+        mock_task_repository.list_tasks.side_effect = [
+            ([old], page_key),
+            ([old], None),
+        ]
+        mock_task_repository.delete_task.return_value = True
+
+        count = cleanup_service.cleanup_expired_tasks()
+
+        assert count == 1
+        assert mock_task_repository.delete_task.call_count == 1
+
     def test_handles_already_deleted_task(self, cleanup_service, mock_task_repository):
         """任务已被删除时应跳过并继续"""
-        now = datetime.now(timezone.utc)
-        old = _make_task("task_gone", now - timedelta(days=45))
+        old = _make_task("task_gone", NOW - timedelta(days=45))
 
         mock_task_repository.list_tasks.return_value = ([old], None)
         mock_task_repository.delete_task.side_effect = TaskNotFoundError("gone")
@@ -154,29 +184,28 @@ class TestCleanupExpiredTasks:
 
     def test_custom_cutoff_date(self, cleanup_service, mock_task_repository):
         """使用自定义截止日期"""
-        now = datetime.now(timezone.utc)
-        task = _make_task("task_1", now - timedelta(days=10))
+        task = _make_task("task_1", NOW - timedelta(days=10))
 
         mock_task_repository.list_tasks.return_value = ([task], None)
         mock_task_repository.delete_task.return_value = True
 
         # 使用 5 天前作为截止日期，task 应被删除
-        cutoff = now - timedelta(days=5)
+        cutoff = NOW - timedelta(days=5)
         count = cleanup_service.cleanup_expired_tasks(cutoff_date=cutoff)
 
         assert count == 1
 
 
+@freeze_time("2024-06-01")
 class TestCleanupExpiredS3Files:
     """测试 S3 文件清理"""
 
     def test_deletes_old_files(self, cleanup_service, mock_s3_service):
         """过期 S3 文件应被删除"""
-        now = datetime.now(timezone.utc)
         mock_s3_service.s3_client.list_objects_v2.return_value = {
             "Contents": [
-                {"Key": "tasks/old_task/result.tif", "LastModified": now - timedelta(days=45)},
-                {"Key": "tasks/new_task/result.tif", "LastModified": now - timedelta(days=5)},
+                {"Key": "tasks/old_task/result.tif", "LastModified": NOW - timedelta(days=45)},
+                {"Key": "tasks/new_task/result.tif", "LastModified": NOW - timedelta(days=5)},
             ],
             "IsTruncated": False,
         }
@@ -189,10 +218,9 @@ class TestCleanupExpiredS3Files:
 
     def test_no_files_to_delete(self, cleanup_service, mock_s3_service):
         """没有过期文件时返回 0"""
-        now = datetime.now(timezone.utc)
         mock_s3_service.s3_client.list_objects_v2.return_value = {
             "Contents": [
-                {"Key": "tasks/new/file.tif", "LastModified": now - timedelta(days=1)},
+                {"Key": "tasks/new/file.tif", "LastModified": NOW - timedelta(days=1)},
             ],
             "IsTruncated": False,
         }
@@ -214,10 +242,11 @@ class TestCleanupExpiredS3Files:
 
     def test_handles_pagination(self, cleanup_service, mock_s3_service):
         """分页场景下应清理所有过期文件"""
-        now = datetime.now(timezone.utc)
-        old_date = now - timedelta(days=60)
+        old_date = NOW - timedelta(days=60)
 
-        mock_s3_service.s3_client.list_objects_v2.side_effect = [
+        # 使用迭代器闭包代替 side_effect 列表，
+        # 避免 mock 每次调用都走 side_effect 列表消费路径
+        pages = iter([
             {
                 "Contents": [{"Key": "tasks/a/f.tif", "LastModified": old_date}],
                 "IsTruncated": True,
@@ -227,7 +256,8 @@ class TestCleanupExpiredS3Files:
                 "Contents": [{"Key": "tasks/b/f.tif", "LastModified": old_date}],
                 "IsTruncated": False,
             },
-        ]
+        ])
+        mock_s3_service.s3_client.list_objects_v2.side_effect = lambda **kw: next(pages)
         mock_s3_service.delete_file.return_value = True
 
         count = cleanup_service.cleanup_expired_s3_files()
@@ -236,8 +266,7 @@ class TestCleanupExpiredS3Files:
 
     def test_continues_on_delete_error(self, cleanup_service, mock_s3_service):
         """单个文件删除失败时应继续处理其他文件"""
-        now = datetime.now(timezone.utc)
-        old_date = now - timedelta(days=60)
+        old_date = NOW - timedelta(days=60)
 
         mock_s3_service.s3_client.list_objects_v2.return_value = {
             "Contents": [
@@ -254,35 +283,28 @@ class TestCleanupExpiredS3Files:
         assert count == 1
 
 
+@freeze_time("2024-06-01")
 class TestCleanupExpiredLogs:
     """测试 CloudWatch 日志清理"""
 
     def test_deletes_old_log_streams(self, cleanup_service, mock_logs_client):
         """过期日志流应被删除"""
-        now = datetime.now(timezone.utc)
-        old_ts = int((now - timedelta(days=60)).timestamp() * 1000)
-        recent_ts = int((now - timedelta(days=5)).timestamp() * 1000)
+        old_ts = int((NOW - timedelta(days=60)).timestamp() * 1000)
+        recent_ts = int((NOW - timedelta(days=5)).timestamp() * 1000)
 
         # Mock paginator for log groups
         group_paginator = Mock()
         group_paginator.paginate.return_value = [
             {"logGroups": [{"logGroupName": "/aws/batch/job-def"}]}
         ]
+        mock_logs_client.get_paginator.return_value = group_paginator
 
-        # Mock paginator for log streams
-        stream_paginator = Mock()
-        stream_paginator.paginate.return_value = [
-            {
-                "logStreams": [
-                    {"logStreamName": "old-stream", "lastEventTimestamp": old_ts},
-                    {"logStreamName": "new-stream", "lastEventTimestamp": recent_ts},
-                ]
-            }
-        ]
-
-        mock_logs_client.get_paginator.side_effect = lambda name: (
-            group_paginator if name == "describe_log_groups" else stream_paginator
-        )
+        mock_logs_client.describe_log_streams.return_value = {
+            "logStreams": [
+                {"logStreamName": "old-stream", "lastEventTimestamp": old_ts},
+                {"logStreamName": "new-stream", "lastEventTimestamp": recent_ts},
+            ]
+        }
 
         count = cleanup_service.cleanup_expired_logs()
 
@@ -292,6 +314,32 @@ class TestCleanupExpiredLogs:
             logStreamName="old-stream",
         )
 
+    def test_early_exit_when_all_streams_recent(
+        self, cleanup_service, mock_logs_client
+    ):
+        """首页全部为未过期流时不应继续分页"""
+        recent_ts = int((NOW - timedelta(days=5)).timestamp() * 1000)
+
+        group_paginator = Mock()
+        group_paginator.paginate.return_value = [
+            {"logGroups": [{"logGroupName": "/aws/batch/job-def"}]}
+        ]
+        mock_logs_client.get_paginator.return_value = group_paginator
+
+        # 即使还有后续页（nextToken 存在），首页全部未过期就应提前结束
+        mock_logs_client.describe_log_streams.return_value = {
+            "logStreams": [
+                {"logStreamName": "new-stream", "lastEventTimestamp": recent_ts},
+            ],
+            "nextToken": "more",
+        }
+
+        count = cleanup_service.cleanup_expired_logs()
+
+        assert count == 0
+        assert mock_logs_client.describe_log_streams.call_count == 1
+        mock_logs_client.delete_log_stream.assert_not_called()
+
     def test_no_log_groups(self, cleanup_service, mock_logs_client):
         """没有日志组时返回 0"""
         paginator = Mock()
@@ -2,353 +2,328 @@
 Unit tests for S3 Storage Service.
 Tests file upload, download, presigned URL generation, and error handling.
 """
+import io
 import os
 import tempfile
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-from botocore.exceptions import ClientError
-from app.services.s3_storage_service import S3StorageService
+from unittest.mock import patch
 
+_BUCKET = 'test-bucket'
+_REGION = 'us-west-2'
+
+
+@pytest.fixture(scope="module")
+def aws_s3():
+    """Module-wide moto S3 backend with the test bucket pre-created.
+
+    Module scope keeps moto state local to the file, so xdist workers
+    running with --dist=loadfile never share backend state and each pays
+    moto startup exactly once.
+
+    boto3/moto are imported lazily so collecting the file (or running an
+    unrelated subset) does not pay their import cost.
+    """
+    import boto3
+    import moto
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ.setdefault('AWS_SECURITY_TOKEN', 'testing')
+    os.environ.setdefault('AWS_SESSION_TOKEN', 'testing')
+
+    with moto.mock_aws():
+        boto3.client('s3', region_name=_REGION).create_bucket(
+            Bucket=_BUCKET,
+            CreateBucketConfiguration={'LocationConstraint': _REGION},
+        )
+        yield
 
-@pytest.fixture
-def s3_service():
-    """Create S3StorageService instance for testing."""
-    return S3StorageService(
-        bucket_name='test-bucket',
-        region='us-west-2'
-    )
 
+@pytest.fixture(scope="module")
+def shared_s3_client(aws_s3):
+    """Single boto3 Session/client reused across the module.
 
-@pytest.fixture
-def mock_s3_client():
-    """Create a mock S3 client."""
-    with patch('boto3.client') as mock_client:
-        yield mock_client.return_value
+    Creating a client re-parses the S3 service model each time; building
+    one from a cached Session (inside the moto context) pays that cost once.
+    """
+    import boto3
+
+    session = boto3.session.Session(region_name=_REGION)
+    return session.client('s3')
+
+
+@pytest.fixture(scope="module")
+def s3_service(aws_s3, shared_s3_client):
+    """Create a single moto-backed S3StorageService shared by the module."""
+    from app.services.s3_storage_service import S3StorageService
+
+    service = S3StorageService(
+        bucket_name=_BUCKET,
+        region=_REGION
+    )
+    service.s3_client = shared_s3_client
+    return service
 
 
 class TestS3StorageService:
     """Test suite for S3StorageService."""
-    
+
     def test_initialization(self, s3_service):
         """Test S3StorageService initialization."""
         assert s3_service.bucket_name == 'test-bucket'
         assert s3_service.region == 'us-west-2'
         assert s3_service.s3_client is not None
-    
-    def test_upload_file_success(self, s3_service, mock_s3_client):
-        """Test successful file upload."""
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
-            f.write('test content')
-            temp_file = f.name
-        
-        try:
-            # Mock S3 client
-            s3_service.s3_client = mock_s3_client
-            mock_s3_client.upload_file = Mock()
-            
-            # Upload file
-            s3_url = s3_service.upload_file(temp_file, 'test/file.txt')
-            
-            # Verify
-            assert s3_url == 's3://test-bucket/test/file.txt'
-            mock_s3_client.upload_file.assert_called_once()
-            
-        finally:
-            # Clean up
-            os.unlink(temp_file)
-    
-    def test_upload_file_with_metadata(self, s3_service, mock_s3_client):
-        """Test file upload with metadata."""
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
-            f.write('test content')
-            temp_file = f.name
-        
-        try:
-            # Mock S3 client
-            s3_service.s3_client = mock_s3_client
-            mock_s3_client.upload_file = Mock()
-            
-            # Upload file with metadata
-            metadata = {'task_id': 'task_123', 'index': 'NDVI'}
-            s3_url = s3_service.upload_file(
-                temp_file,
-                'test/file.txt',
-                metadata=metadata
-            )
-            
-            # Verify
-            assert s3_url == 's3://test-bucket/test/file.txt'
-            call_args = mock_s3_client.upload_file.call_args
-            assert call_args[1]['ExtraArgs']['Metadata'] == metadata
-            
-        finally:
-            # Clean up
-            os.unlink(temp_file)
-    
+
+    def test_client_pool_configured(self, aws_s3):
+        """Test that the service's own client uses a widened connection pool."""
+        from app.services.s3_storage_service import S3StorageService
+
+        service = S3StorageService(bucket_name=_BUCKET, region=_REGION)
+        assert service.s3_client.meta.config.max_pool_connections == 64
+
+    def test_upload_file_success(self, s3_service):
+        """Test successful upload from an in-memory stream."""
+        # Upload stream (no filesystem round-trip)
+        s3_url = s3_service.upload_file_obj(
+            io.BytesIO(b'test content'), 'upload/file.txt'
+        )
+
+        # Verify against the moto backend
+        assert s3_url == 's3://test-bucket/upload/file.txt'
+        assert s3_service.file_exists('upload/file.txt') is True
+
+    def test_upload_file_with_metadata(self, s3_service):
+        """Test stream upload with metadata."""
+        # Upload stream with metadata
+        metadata = {'task_id': 'task_123', 'index': 'NDVI'}
+        s3_url = s3_service.upload_file_obj(
+            io.BytesIO(b'test content'),
+            'upload/file_meta.txt',
+            metadata=metadata
+        )
+
+        # Verify the metadata round-trips through S3
+        assert s3_url == 's3://test-bucket/upload/file_meta.txt'
+        head = s3_service.s3_client.head_object(
+            Bucket='test-bucket', Key='upload/file_meta.txt'
+        )
+        assert head['Metadata'] == metadata
+
+    def test_upload_uses_transfer_config(self, s3_service, tmp_path):
+        """Test that uploads pass the multipart TransferConfig through."""
+        path = tmp_path / 'transfer.txt'
+        path.write_bytes(b'x')
+
+        with patch.object(s3_service.s3_client, 'upload_file') as mock_upload:
+            s3_service.upload_file(str(path), 'transfer/file.txt')
+
+        config = mock_upload.call_args.kwargs['Config']
+        assert config.multipart_threshold == 8 * 1024 * 1024
+        assert config.multipart_chunksize == 8 * 1024 * 1024
+        assert config.max_concurrency == 8
+
+    def test_upload_files_bulk(self, s3_service, tmp_path):
+        """Test parallel bulk upload of many small files."""
+        items = []
+        for i in range(32):
+            path = tmp_path / f'bulk{i}.txt'
+            path.write_bytes(b'x')
+            items.append((str(path), f'bulk/file{i}.txt'))
+
+        urls = s3_service.upload_files_bulk(items)
+
+        # Verify all objects landed with one listing call
+        assert len(urls) == 32
+        response = s3_service.s3_client.list_objects_v2(
+            Bucket='test-bucket', Prefix='bulk/'
+        )
+        keys = {obj['Key'] for obj in response['Contents']}
+        assert keys == {f'bulk/file{i}.txt' for i in range(32)}
+
     def test_upload_file_not_found(self, s3_service):
         """Test upload with non-existent file."""
         with pytest.raises(FileNotFoundError):
             s3_service.upload_file('/nonexistent/file.txt', 'test/file.txt')
-    
-    def test_upload_file_s3_error(self, s3_service, mock_s3_client):
-        """Test upload with S3 error."""
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False) as f:
-            f.write('test content')
-            temp_file = f.name
-        
-        try:
-            # Mock S3 client to raise error
-            s3_service.s3_client = mock_s3_client
-            mock_s3_client.upload_file = Mock(
-                side_effect=ClientError(
-                    {'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}},
-                    'upload_file'
-                )
+
+    @pytest.mark.parametrize("method_name, call", [
+        ('upload_fileobj',
+         lambda s: s.upload_file_obj(io.BytesIO(b'test content'), 'err/key')),
+        ('download_file', lambda s: s.download_file('err/key', '/tmp/err.txt')),
+        ('generate_presigned_url', lambda s: s.generate_presigned_url('err/key')),
+        ('delete_object', lambda s: s.delete_file('err/key')),
+        ('list_objects_v2', lambda s: s.list_files()),
+        ('head_object', lambda s: s.get_file_size('err/key')),
+    ])
+    def test_client_error_propagates(self, s3_service, method_name, call):
+        """Test that ClientError from any client method is propagated."""
+        from botocore.exceptions import ClientError
+
+        with patch.object(
+            s3_service.s3_client,
+            method_name,
+            side_effect=ClientError(
+                {'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}},
+                method_name
             )
-            
+        ):
             # Verify error is raised
             with pytest.raises(ClientError):
-                s3_service.upload_file(temp_file, 'test/file.txt')
-                
-        finally:
-            # Clean up
-            os.unlink(temp_file)
-    
-    def test_download_file_success(self, s3_service, mock_s3_client):
+                call(s3_service)
+
+    def test_download_file_success(self, s3_service):
         """Test successful file download."""
-        # Mock S3 client
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.download_file = Mock()
-        
+        s3_service.s3_client.put_object(
+            Bucket='test-bucket', Key='download/file.txt', Body=b'download me'
+        )
+
         # Create temporary directory
         with tempfile.TemporaryDirectory() as temp_dir:
             local_path = os.path.join(temp_dir, 'downloaded.txt')
-            
+
             # Download file
-            result = s3_service.download_file('test/file.txt', local_path)
-            
+            result = s3_service.download_file('download/file.txt', local_path)
+
             # Verify
             assert result == local_path
-            mock_s3_client.download_file.assert_called_once_with(
-                'test-bucket',
-                'test/file.txt',
-                local_path
-            )
-    
-    def test_download_file_s3_error(self, s3_service, mock_s3_client):
-        """Test download with S3 error."""
-        # Mock S3 client to raise error
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.download_file = Mock(
-            side_effect=ClientError(
-                {'Error': {'Code': 'NoSuchKey', 'Message': 'Key not found'}},
-                'download_file'
-            )
-        )
-        
-        # Verify error is raised
-        with tempfile.TemporaryDirectory() as temp_dir:
-            local_path = os.path.join(temp_dir, 'downloaded.txt')
-            with pytest.raises(ClientError):
-                s3_service.download_file('test/file.txt', local_path)
-    
-    def test_generate_presigned_url_success(self, s3_service, mock_s3_client):
+            with open(local_path, 'rb') as f:
+                assert f.read() == b'download me'
+
+    def test_generate_presigned_url_success(self, s3_service):
         """Test presigned URL generation."""
-        # Mock S3 client
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.generate_presigned_url = Mock(
-            return_value='https://test-bucket.s3.amazonaws.com/test/file.txt?signature=xyz'
-        )
-        
-        # Generate presigned URL
-        url = s3_service.generate_presigned_url('test/file.txt', expiration=3600)
-        
-        # Verify
-        assert url.startswith('https://test-bucket.s3.amazonaws.com')
-        assert 'signature=' in url
-        mock_s3_client.generate_presigned_url.assert_called_once_with(
-            'get_object',
-            Params={'Bucket': 'test-bucket', 'Key': 'test/file.txt'},
-            ExpiresIn=3600
-        )
-    
-    def test_generate_presigned_url_custom_expiration(self, s3_service, mock_s3_client):
+        with patch.object(
+            s3_service.s3_client,
+            'generate_presigned_url',
+            return_value='https://test-bucket.s3.amazonaws.com/presign/file.txt?signature=xyz'
+        ) as mock_presign:
+            # Generate presigned URL
+            url = s3_service.generate_presigned_url('presign/file.txt', expiration=3600)
+
+            # Verify
+            assert url.startswith('https://test-bucket.s3.amazonaws.com')
+            assert 'signature=' in url
+            assert mock_presign.call_count == 1
+            assert mock_presign.call_args.args == ('get_object',)
+            assert mock_presign.call_args.kwargs == {
+                'Params': {'Bucket': 'test-bucket', 'Key': 'presign/file.txt'},
+                'ExpiresIn': 3600,
+            }
+
+    def test_generate_presigned_url_custom_expiration(self, s3_service):
         """Test presigned URL with custom expiration."""
-        # Mock S3 client
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.generate_presigned_url = Mock(
-            return_value='https://test-bucket.s3.amazonaws.com/test/file.txt?signature=xyz'
-        )
-        
-        # Generate presigned URL with custom expiration
-        url = s3_service.generate_presigned_url('test/file.txt', expiration=7200)
-        
-        # Verify expiration parameter
-        call_args = mock_s3_client.generate_presigned_url.call_args
-        assert call_args[1]['ExpiresIn'] == 7200
-    
-    def test_generate_presigned_url_error(self, s3_service, mock_s3_client):
-        """Test presigned URL generation with error."""
-        # Mock S3 client to raise error
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.generate_presigned_url = Mock(
-            side_effect=ClientError(
-                {'Error': {'Code': 'InvalidRequest', 'Message': 'Invalid request'}},
-                'generate_presigned_url'
-            )
-        )
-        
-        # Verify error is raised
-        with pytest.raises(ClientError):
-            s3_service.generate_presigned_url('test/file.txt')
-    
-    def test_delete_file_success(self, s3_service, mock_s3_client):
+        with patch.object(
+            s3_service.s3_client,
+            'generate_presigned_url',
+            return_value='https://test-bucket.s3.amazonaws.com/presign/custom.txt?signature=xyz'
+        ) as mock_presign:
+            # Generate presigned URL with custom expiration
+            s3_service.generate_presigned_url('presign/custom.txt', expiration=7200)
+
+            # Verify expiration parameter
+            call_args = mock_presign.call_args
+            assert call_args[1]['ExpiresIn'] == 7200
+
+    def test_generate_presigned_url_same_window(self, s3_service):
+        """Test that repeated calls in the same window reuse the cached URL."""
+        with patch.object(
+            s3_service.s3_client,
+            'generate_presigned_url',
+            return_value='https://test-bucket.s3.amazonaws.com/presign/cached.txt?signature=abc'
+        ) as mock_presign:
+            url1 = s3_service.generate_presigned_url('presign/cached.txt')
+            url2 = s3_service.generate_presigned_url('presign/cached.txt')
+
+            # Second call is served from the cache
+            assert url1 == url2
+            assert mock_presign.call_count == 1
+
+    def test_delete_file_success(self, s3_service):
         """Test successful file deletion."""
-        # Mock S3 client
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.delete_object = Mock()
-        
+        s3_service.s3_client.put_object(
+            Bucket='test-bucket', Key='delete/file.txt', Body=b'x'
+        )
+
         # Delete file
-        result = s3_service.delete_file('test/file.txt')
-        
+        result = s3_service.delete_file('delete/file.txt')
+
         # Verify
         assert result is True
-        mock_s3_client.delete_object.assert_called_once_with(
-            Bucket='test-bucket',
-            Key='test/file.txt'
-        )
-    
-    def test_delete_file_error(self, s3_service, mock_s3_client):
-        """Test file deletion with error."""
-        # Mock S3 client to raise error
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.delete_object = Mock(
-            side_effect=ClientError(
-                {'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}},
-                'delete_object'
-            )
-        )
-        
-        # Verify error is raised
-        with pytest.raises(ClientError):
-            s3_service.delete_file('test/file.txt')
-    
-    def test_list_files_success(self, s3_service, mock_s3_client):
+        assert s3_service.file_exists('delete/file.txt') is False
+
+    def test_list_files_success(self, s3_service):
         """Test listing files."""
-        # Mock S3 client
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.list_objects_v2 = Mock(
-            return_value={
-                'Contents': [
-                    {'Key': 'test/file1.txt'},
-                    {'Key': 'test/file2.txt'},
-                    {'Key': 'test/file3.txt'},
-                ]
-            }
-        )
-        
+        for key in ('list/file1.txt', 'list/file2.txt', 'list/file3.txt'):
+            s3_service.s3_client.put_object(
+                Bucket='test-bucket', Key=key, Body=b'x'
+            )
+
         # List files
-        files = s3_service.list_files(prefix='test/')
-        
+        files = s3_service.list_files(prefix='list/')
+
+        # Verify
+        assert len(files) == 3
+        assert 'list/file1.txt' in files
+        assert 'list/file2.txt' in files
+        assert 'list/file3.txt' in files
+
+    def test_list_files_respects_max_keys(self, s3_service):
+        """Test that pagination stops at max_keys items."""
+        for i in range(5):
+            s3_service.s3_client.put_object(
+                Bucket='test-bucket', Key=f'page/file{i}.txt', Body=b'x'
+            )
+
+        files = s3_service.list_files(prefix='page/', max_keys=3)
+
         # Verify
         assert len(files) == 3
-        assert 'test/file1.txt' in files
-        assert 'test/file2.txt' in files
-        assert 'test/file3.txt' in files
-        mock_s3_client.list_objects_v2.assert_called_once()
-    
-    def test_list_files_empty(self, s3_service, mock_s3_client):
+
+    def test_list_files_empty(self, s3_service):
         """Test listing files with no results."""
-        # Mock S3 client
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.list_objects_v2 = Mock(return_value={})
-        
-        # List files
         files = s3_service.list_files(prefix='nonexistent/')
-        
+
         # Verify
         assert len(files) == 0
-    
-    def test_list_files_error(self, s3_service, mock_s3_client):
-        """Test listing files with error."""
-        # Mock S3 client to raise error
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.list_objects_v2 = Mock(
-            side_effect=ClientError(
-                {'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}},
-                'list_objects_v2'
-            )
-        )
-        
-        # Verify error is raised
-        with pytest.raises(ClientError):
-            s3_service.list_files()
-    
-    def test_file_exists_true(self, s3_service, mock_s3_client):
+
+    def test_file_exists_true(self, s3_service):
         """Test file exists check when file exists."""
-        # Mock S3 client
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.head_object = Mock(return_value={'ContentLength': 1024})
-        
+        s3_service.s3_client.put_object(
+            Bucket='test-bucket', Key='exists/file.txt', Body=b'x'
+        )
+
         # Check if file exists
-        exists = s3_service.file_exists('test/file.txt')
-        
+        exists = s3_service.file_exists('exists/file.txt')
+
         # Verify
         assert exists is True
-        mock_s3_client.head_object.assert_called_once_with(
-            Bucket='test-bucket',
-            Key='test/file.txt'
-        )
-    
-    def test_file_exists_false(self, s3_service, mock_s3_client):
+
+    def test_file_exists_false(self, s3_service):
         """Test file exists check when file doesn't exist."""
-        # Mock S3 client to raise 404 error
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.head_object = Mock(
-            side_effect=ClientError(
-                {'Error': {'Code': '404', 'Message': 'Not Found'}},
-                'head_object'
-            )
-        )
-        
-        # Check if file exists
-        exists = s3_service.file_exists('test/nonexistent.txt')
-        
+        exists = s3_service.file_exists('exists/nonexistent.txt')
+
         # Verify
         assert exists is False
-    
-    def test_get_file_size_success(self, s3_service, mock_s3_client):
+
+    def test_file_exists_cached(self, s3_service):
+        """Test that back-to-back existence checks issue only one HEAD."""
+        with patch.object(
+            s3_service.s3_client,
+            'head_object',
+            return_value={'ContentLength': 1}
+        ) as mock_head:
+            assert s3_service.file_exists('cache/file.txt') is True
+            assert s3_service.file_exists('cache/file.txt') is True
+
+            # Second call is served from the TTL cache
+            assert mock_head.call_count == 1
+
+    def test_get_file_size_success(self, s3_service):
         """Test getting file size."""
-        # Mock S3 client
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.head_object = Mock(
-            return_value={'ContentLength': 2048}
+        s3_service.s3_client.put_object(
+            Bucket='test-bucket', Key='size/file.txt', Body=b'x' * 2048
         )
-        
+
         # Get file size
-        size = s3_service.get_file_size('test/file.txt')
-        
+        size = s3_service.get_file_size('size/file.txt')
+
         # Verify
         assert size == 2048
-        mock_s3_client.head_object.assert_called_once_with(
-            Bucket='test-bucket',
-            Key='test/file.txt'
-        )
-    
-    def test_get_file_size_error(self, s3_service, mock_s3_client):
-        """Test getting file size with error."""
-        # Mock S3 client to raise error
-        s3_service.s3_client = mock_s3_client
-        mock_s3_client.head_object = Mock(
-            side_effect=ClientError(
-                {'Error': {'Code': 'NoSuchKey', 'Message': 'Key not found'}},
-                'head_object'
-            )
-        )
-        
-        # Verify error is raised
-        with pytest.raises(ClientError):
-            s3_service.get_file_size('test/nonexistent.txt')
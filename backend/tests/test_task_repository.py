@@ -1,11 +1,10 @@
 """
 任务仓库单元测试
 """
-import os
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock
 from botocore.exceptions import ClientError
 
 from app.services.task_repository import (
@@ -17,44 +16,129 @@ from app.services.task_repository import (
 from app.models.processing import ProcessingTask, ProcessingResult
 
 
+# 共享的任务 Item 模板：dict.copy 一次 C 调用，比重复执行字面量构造便宜
+_ITEM_TEMPLATE = {
+    "task_type": "indices",
+    "progress": 0,
+    "parameters": {},
+    "retry_count": 0,
+    "max_retries": 3,
+}
+
+
+def _task_item(task_id, status="queued", ts=None, **extra):
+    """基于共享模板构造一条 DynamoDB 任务 Item"""
+    item = _ITEM_TEMPLATE.copy()
+    item.update(task_id=task_id, status=status, created_at=ts, updated_at=ts)
+    item.update(extra)
+    return item
+
+
+def _sample_item(task, status=None, **extra):
+    """把 ProcessingTask 转成对应的 DynamoDB Item"""
+    return _task_item(
+        task.task_id,
+        status or task.status,
+        task.created_at.isoformat(),
+        parameters=task.parameters,
+        **extra
+    )
+
+
+class _FakeTable:
+    """内存假表：用 dict 实现用到的 DynamoDB 动词，CRUD 测试走真实往返
+
+    比逐个 Mock 表方法覆盖更多生产代码：put_item 写进去的 Item
+    就是后续 query/update_item/delete_item 操作的对象。
+    """
+
+    def __init__(self):
+        self.table_name = "ProcessingTasks"
+        self._items = {}
+        # load 保留为 Mock，便于连接错误测试注入 side_effect
+        self.load = Mock()
+
+    def put_item(self, *, Item, **_kwargs):
+        self._items[Item["task_id"]] = dict(Item)
+
+    def query(self, *, KeyConditionExpression, **_kwargs):
+        attr, value = KeyConditionExpression.get_expression()["values"]
+        if attr.name == "task_id":
+            item = self._items.get(value)
+            items = [item] if item is not None else []
+        else:
+            # GSI 查询（如 BatchJobIndex）：按属性线性扫描
+            items = [
+                item for item in self._items.values()
+                if item.get(attr.name) == value
+            ]
+        return {"Items": items}
+
+    def update_item(self, *, Key, UpdateExpression,
+                    ExpressionAttributeValues,
+                    ExpressionAttributeNames=None, **_kwargs):
+        item = self._items[Key["task_id"]]
+        names = ExpressionAttributeNames or {}
+        for clause in UpdateExpression.removeprefix("SET ").split(", "):
+            target, _, placeholder = clause.partition(" = ")
+            item[names.get(target, target)] = ExpressionAttributeValues[placeholder]
+
+    def delete_item(self, *, Key, **_kwargs):
+        self._items.pop(Key["task_id"], None)
+
+    def scan(self, **_kwargs):
+        return {"Items": list(self._items.values())}
+
+
+class _ResourceStub:
+    """轻量资源桩：Table() 永远返回同一个表桩"""
+
+    def __init__(self, table):
+        self._table = table
+
+    def Table(self, _name):
+        return self._table
+
+
 @pytest.fixture
 def mock_dynamodb_table():
     """模拟 DynamoDB 表"""
-    table = Mock()
-    table.table_name = "ProcessingTasks"
-    table.load = Mock()
-    return table
+    return _FakeTable()
 
 
 @pytest.fixture
 def mock_dynamodb_resource(mock_dynamodb_table):
     """模拟 DynamoDB 资源"""
-    resource = Mock()
-    resource.Table.return_value = mock_dynamodb_table
-    return resource
+    return _ResourceStub(mock_dynamodb_table)
+
+
+@pytest.fixture(autouse=True)
+def _patch_boto3(mock_dynamodb_resource, monkeypatch):
+    """自动把 boto3.resource 换成资源桩（Mock 包装以便断言调用参数）"""
+    mock = Mock(return_value=mock_dynamodb_resource)
+    monkeypatch.setattr("boto3.resource", mock)
+    return mock
 
 
 @pytest.fixture
-def task_repository(mock_dynamodb_resource):
+def task_repository(_patch_boto3):
     """创建任务仓库实例"""
-    with patch("boto3.resource", return_value=mock_dynamodb_resource):
-        repo = TaskRepository(
-            table_name="ProcessingTasks",
-            region="us-west-2"
-        )
-        return repo
+    return TaskRepository(
+        table_name="ProcessingTasks",
+        region="us-west-2"
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_task():
-    """创建示例任务"""
+    """创建示例任务（固定时间戳，模块内共享，测试只读）"""
     return ProcessingTask(
         task_id="task_123456",
         task_type="indices",
         status="queued",
         progress=0,
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow(),
+        created_at=datetime(2024, 1, 15, 12, 0, 0),
+        updated_at=datetime(2024, 1, 15, 12, 0, 0),
         parameters={
             "image_id": "S2A_MSIL2A_20240115",
             "indices": ["NDVI", "SAVI"],
@@ -66,336 +150,164 @@ def sample_task():
 class TestTaskRepositoryInit:
     """测试任务仓库初始化"""
     
-    def test_init_with_defaults(self, mock_dynamodb_resource):
+    def test_init_with_defaults(self):
         """测试使用默认参数初始化"""
-        with patch("boto3.resource", return_value=mock_dynamodb_resource):
-            repo = TaskRepository()
-            assert repo.table_name == "ProcessingTasks"
-            assert repo.region == "us-west-2"
-    
-    def test_init_with_custom_params(self, mock_dynamodb_resource):
+        repo = TaskRepository()
+        assert repo.table_name == "ProcessingTasks"
+        assert repo.region == "us-west-2"
+
+    def test_init_with_custom_params(self):
         """测试使用自定义参数初始化"""
-        with patch("boto3.resource", return_value=mock_dynamodb_resource):
-            repo = TaskRepository(
-                table_name="CustomTable",
-                region="us-east-1"
-            )
-            assert repo.table_name == "CustomTable"
-            assert repo.region == "us-east-1"
-    
-    def test_init_with_endpoint_url(self, mock_dynamodb_resource):
+        repo = TaskRepository(
+            table_name="CustomTable",
+            region="us-east-1"
+        )
+        assert repo.table_name == "CustomTable"
+        assert repo.region == "us-east-1"
+
+    def test_init_with_endpoint_url(self, _patch_boto3):
         """测试使用端点 URL 初始化（本地开发）"""
-        with patch("boto3.resource", return_value=mock_dynamodb_resource) as mock_boto3:
-            repo = TaskRepository(endpoint_url="http://localhost:8000")
-            mock_boto3.assert_called_once()
-            call_kwargs = mock_boto3.call_args[1]
-            assert call_kwargs["endpoint_url"] == "http://localhost:8000"
-    
-    def test_init_connection_error(self):
+        repo = TaskRepository(endpoint_url="http://localhost:8000")
+        _patch_boto3.assert_called_once()
+        call_kwargs = _patch_boto3.call_args[1]
+        assert call_kwargs["endpoint_url"] == "http://localhost:8000"
+
+    def test_init_connection_error(self, mock_dynamodb_table):
         """测试连接错误"""
-        with patch("boto3.resource") as mock_boto3:
-            mock_resource = Mock()
-            mock_table = Mock()
-            mock_table.load.side_effect = ClientError(
-                {"Error": {"Code": "ResourceNotFoundException"}},
-                "DescribeTable"
-            )
-            mock_resource.Table.return_value = mock_table
-            mock_boto3.return_value = mock_resource
-            
-            with pytest.raises(DatabaseConnectionError):
-                TaskRepository()
-
-
-class TestCreateTask:
-    """测试创建任务"""
-    
-    def test_create_task_success(self, task_repository, sample_task):
-        """测试成功创建任务"""
-        task_repository.table.put_item = Mock()
-        
-        task_id = task_repository.create_task(sample_task)
-        
-        assert task_id == sample_task.task_id
-        task_repository.table.put_item.assert_called_once()
-        
-        # 验证调用参数
-        call_args = task_repository.table.put_item.call_args
-        item = call_args[1]["Item"]
-        assert item["task_id"] == sample_task.task_id
-        assert item["status"] == "queued"
-        assert "ttl" in item
-    
-    def test_create_task_generates_id(self, task_repository, sample_task):
-        """测试自动生成任务 ID"""
-        sample_task.task_id = ""
-        task_repository.table.put_item = Mock()
-        
-        task_id = task_repository.create_task(sample_task)
-        
-        assert task_id.startswith("task_")
-        assert len(task_id) > 5
-    
-    def test_create_task_client_error(self, task_repository, sample_task):
-        """测试创建任务时的客户端错误"""
-        task_repository.table.put_item.side_effect = ClientError(
-            {"Error": {"Code": "ValidationException"}},
-            "PutItem"
+        mock_dynamodb_table.load.side_effect = ClientError(
+            {"Error": {"Code": "ResourceNotFoundException"}},
+            "DescribeTable"
         )
-        
+
         with pytest.raises(DatabaseConnectionError):
-            task_repository.create_task(sample_task)
+            TaskRepository()
 
 
-class TestGetTask:
-    """测试获取任务"""
-    
-    def test_get_task_success(self, task_repository, sample_task):
-        """测试成功获取任务"""
-        # 模拟 DynamoDB 响应
-        dynamodb_item = {
-            "task_id": sample_task.task_id,
-            "created_at": sample_task.created_at.isoformat(),
-            "task_type": sample_task.task_type,
-            "status": sample_task.status,
-            "progress": sample_task.progress,
-            "updated_at": sample_task.updated_at.isoformat(),
-            "parameters": sample_task.parameters,
-            "retry_count": 0,
-            "max_retries": 3
-        }
-        
-        task_repository.table.query = Mock(return_value={
-            "Items": [dynamodb_item]
-        })
-        
-        task = task_repository.get_task(sample_task.task_id)
-        
+class TestTaskCrud:
+    """CRUD 往返测试：经由内存假表走真实的 create → get → update → delete 路径"""
+
+    def test_crud_round_trip(self, task_repository, sample_task):
+        """测试任务全生命周期往返"""
+        # 创建
+        task_id = task_repository.create_task(sample_task)
+        assert task_id == sample_task.task_id
+        stored = task_repository.table._items[task_id]
+        assert stored["status"] == "queued"
+        assert "ttl" in stored
+
+        # 读取：写进去的就是读出来的
+        task = task_repository.get_task(task_id)
         assert task.task_id == sample_task.task_id
-        assert task.status == sample_task.status
         assert task.task_type == sample_task.task_type
-    
-    def test_get_task_not_found(self, task_repository):
-        """测试获取不存在的任务"""
-        task_repository.table.query = Mock(return_value={"Items": []})
-        
-        with pytest.raises(TaskNotFoundError):
-            task_repository.get_task("nonexistent_task")
-    
-    def test_get_task_with_result(self, task_repository, sample_task):
-        """测试获取包含结果的任务"""
-        result_data = {
-            "output_files": [
-                {
-                    "name": "NDVI.tif",
-                    "s3_key": "tasks/task_123456/NDVI.tif",
-                    "s3_url": "s3://bucket/tasks/task_123456/NDVI.tif",
-                    "download_url": "https://...",
-                    "size_mb": 45.2
-                }
-            ],
-            "metadata": {"processing_time": 120}
-        }
-        
-        dynamodb_item = {
-            "task_id": sample_task.task_id,
-            "created_at": sample_task.created_at.isoformat(),
-            "task_type": sample_task.task_type,
-            "status": "completed",
-            "progress": 100,
-            "updated_at": sample_task.updated_at.isoformat(),
-            "parameters": sample_task.parameters,
-            "result": result_data,
-            "retry_count": 0,
-            "max_retries": 3
-        }
-        
-        task_repository.table.query = Mock(return_value={
-            "Items": [dynamodb_item]
-        })
-        
-        task = task_repository.get_task(sample_task.task_id)
-        
-        assert task.result is not None
-        assert len(task.result.output_files) == 1
-        assert task.result.metadata["processing_time"] == 120
+        assert task.parameters == sample_task.parameters
 
-
-class TestUpdateTaskStatus:
-    """测试更新任务状态"""
-    
-    def test_update_status_basic(self, task_repository, sample_task):
-        """测试基本状态更新"""
-        # 模拟 get_task
-        task_repository.get_task = Mock(return_value=sample_task)
-        task_repository.table.update_item = Mock()
-        
-        success = task_repository.update_task_status(
-            sample_task.task_id,
-            status="running",
-            progress=50
-        )
-        
-        assert success is True
-        task_repository.table.update_item.assert_called_once()
-        
-        # 验证更新表达式
-        call_args = task_repository.table.update_item.call_args
-        assert "running" in str(call_args)
-    
-    def test_update_status_with_batch_info(self, task_repository, sample_task):
-        """测试更新包含 Batch 信息的状态"""
-        task_repository.get_task = Mock(return_value=sample_task)
-        task_repository.table.update_item = Mock()
-        
-        success = task_repository.update_task_status(
-            sample_task.task_id,
+        # 更新状态与 Batch 信息
+        assert task_repository.update_task_status(
+            task_id,
             status="running",
+            progress=50,
             batch_job_id="batch_abc123",
             batch_job_status="RUNNING"
-        )
-        
-        assert success is True
-        call_args = task_repository.table.update_item.call_args
-        update_expr = call_args[1]["UpdateExpression"]
-        assert "batch_job_id" in update_expr
-        assert "batch_job_status" in update_expr
-    
-    def test_update_status_with_result(self, task_repository, sample_task):
-        """测试更新包含结果的状态"""
-        task_repository.get_task = Mock(return_value=sample_task)
-        task_repository.table.update_item = Mock()
-        
+        ) is True
+        task = task_repository.get_task(task_id)
+        assert task.status == "running"
+        assert task.progress == 50
+        assert task.batch_job_id == "batch_abc123"
+
+        # 更新处理结果
         result = ProcessingResult(
             output_files=[{"name": "NDVI.tif"}],
             metadata={"processing_time": 120}
         )
-        
-        success = task_repository.update_task_status(
-            sample_task.task_id,
+        assert task_repository.update_task_status(
+            task_id,
             status="completed",
             progress=100,
             result=result,
             completed_at=datetime.utcnow()
-        )
-        
-        assert success is True
-    
+        ) is True
+        task = task_repository.get_task(task_id)
+        assert task.status == "completed"
+        assert task.result is not None
+        assert len(task.result.output_files) == 1
+        assert task.result.metadata["processing_time"] == 120
+
+        # 删除后再读取应抛出未找到
+        assert task_repository.delete_task(task_id) is True
+        with pytest.raises(TaskNotFoundError):
+            task_repository.get_task(task_id)
+
+    def test_create_task_generates_id(self, task_repository, sample_task):
+        """测试自动生成任务 ID"""
+        # 用副本修改，避免污染模块级共享的 sample_task
+        task = sample_task.model_copy(update={"task_id": ""})
+
+        task_id = task_repository.create_task(task)
+
+        assert task_id.startswith("task_")
+        assert len(task_id) > 5
+
+    @pytest.mark.parametrize("op", ["get_task", "delete_task"])
+    def test_missing_task_raises(self, task_repository, op):
+        """测试读取/删除不存在的任务"""
+        with pytest.raises(TaskNotFoundError):
+            getattr(task_repository, op)("nonexistent_task")
+
     def test_update_status_task_not_found(self, task_repository):
         """测试更新不存在的任务"""
-        task_repository.get_task = Mock(side_effect=TaskNotFoundError("Task not found"))
-        
         with pytest.raises(TaskNotFoundError):
             task_repository.update_task_status("nonexistent", status="running")
 
+    def test_create_task_client_error(self, task_repository, sample_task):
+        """测试创建任务时的客户端错误"""
+        task_repository.table.put_item = Mock(side_effect=ClientError(
+            {"Error": {"Code": "ValidationException"}},
+            "PutItem"
+        ))
+
+        with pytest.raises(DatabaseConnectionError):
+            task_repository.create_task(sample_task)
 
-class TestDeleteTask:
-    """测试删除任务"""
-    
-    def test_delete_task_success(self, task_repository, sample_task):
-        """测试成功删除任务"""
-        task_repository.get_task = Mock(return_value=sample_task)
-        task_repository.table.delete_item = Mock()
-        
-        success = task_repository.delete_task(sample_task.task_id)
-        
-        assert success is True
-        task_repository.table.delete_item.assert_called_once()
-    
-    def test_delete_task_not_found(self, task_repository):
-        """测试删除不存在的任务"""
-        task_repository.get_task = Mock(side_effect=TaskNotFoundError("Task not found"))
-        
-        with pytest.raises(TaskNotFoundError):
-            task_repository.delete_task("nonexistent")
+
+def _make_items(n, status):
+    """构造 n 条任务 Item（时间戳只取一次）"""
+    now = datetime.utcnow().isoformat()
+    progress = 100 if status == "completed" else 0
+    return [
+        _task_item(f"task_{i}", status, now, progress=progress)
+        for i in range(n)
+    ]
 
 
 class TestListTasks:
     """测试列出任务"""
-    
-    def test_list_tasks_all(self, task_repository):
-        """测试列出所有任务"""
-        # 模拟 DynamoDB 响应
-        items = [
-            {
-                "task_id": f"task_{i}",
-                "created_at": datetime.utcnow().isoformat(),
-                "task_type": "indices",
-                "status": "queued",
-                "progress": 0,
-                "updated_at": datetime.utcnow().isoformat(),
-                "parameters": {},
-                "retry_count": 0,
-                "max_retries": 3
-            }
-            for i in range(5)
-        ]
-        
-        task_repository.table.scan = Mock(return_value={
-            "Items": items,
-            "LastEvaluatedKey": None
-        })
-        
-        tasks, next_key = task_repository.list_tasks(limit=10)
-        
-        assert len(tasks) == 5
-        assert next_key is None
-    
-    def test_list_tasks_by_status(self, task_repository):
-        """测试按状态过滤任务"""
-        items = [
-            {
-                "task_id": f"task_{i}",
-                "created_at": datetime.utcnow().isoformat(),
-                "task_type": "indices",
-                "status": "completed",
-                "progress": 100,
-                "updated_at": datetime.utcnow().isoformat(),
-                "parameters": {},
-                "retry_count": 0,
-                "max_retries": 3
-            }
-            for i in range(3)
-        ]
-        
-        task_repository.table.query = Mock(return_value={
-            "Items": items,
-            "LastEvaluatedKey": None
-        })
-        
-        tasks, next_key = task_repository.list_tasks(status="completed", limit=10)
-        
-        assert len(tasks) == 3
-        assert all(task.status == "completed" for task in tasks)
-    
-    def test_list_tasks_with_pagination(self, task_repository):
-        """测试分页列出任务"""
-        items = [
-            {
-                "task_id": f"task_{i}",
-                "created_at": datetime.utcnow().isoformat(),
-                "task_type": "indices",
-                "status": "queued",
-                "progress": 0,
-                "updated_at": datetime.utcnow().isoformat(),
-                "parameters": {},
-                "retry_count": 0,
-                "max_retries": 3
-            }
-            for i in range(20)
-        ]
-        
-        last_key = {"task_id": "task_19", "created_at": datetime.utcnow().isoformat()}
-        
-        task_repository.table.scan = Mock(return_value={
+
+    @pytest.mark.parametrize("n, status, has_last_key, expected_method", [
+        (5, None, False, "scan"),             # 列出所有任务
+        (3, "completed", False, "query"),     # 按状态过滤
+        (20, None, True, "scan"),             # 分页
+    ])
+    def test_list_tasks(self, task_repository, n, status, has_last_key,
+                        expected_method):
+        """参数化测试列出任务：全部 / 按状态过滤 / 分页"""
+        items = _make_items(n, status or "queued")
+        last_key = (
+            {"task_id": f"task_{n - 1}", "created_at": items[0]["created_at"]}
+            if has_last_key else None
+        )
+        mock_op = Mock(return_value={
             "Items": items,
             "LastEvaluatedKey": last_key
         })
-        
-        tasks, next_key = task_repository.list_tasks(limit=20)
-        
-        assert len(tasks) == 20
+        setattr(task_repository.table, expected_method, mock_op)
+
+        tasks, next_key = task_repository.list_tasks(status=status, limit=max(n, 10))
+
+        assert len(tasks) == n
         assert next_key == last_key
+        mock_op.assert_called_once()
+        if status is not None:
+            assert all(task.status == status for task in tasks)
 
 
 class TestQueryByBatchJobId:
@@ -403,69 +315,63 @@ class TestQueryByBatchJobId:
     
     def test_query_by_batch_job_id_found(self, task_repository, sample_task):
         """测试找到任务"""
-        dynamodb_item = {
-            "task_id": sample_task.task_id,
-            "created_at": sample_task.created_at.isoformat(),
-            "task_type": sample_task.task_type,
-            "status": sample_task.status,
-            "progress": sample_task.progress,
-            "updated_at": sample_task.updated_at.isoformat(),
-            "parameters": sample_task.parameters,
-            "batch_job_id": "batch_abc123",
-            "retry_count": 0,
-            "max_retries": 3
-        }
-        
-        task_repository.table.query = Mock(return_value={
-            "Items": [dynamodb_item]
-        })
-        
+        task_repository.table.put_item(
+            Item=_sample_item(sample_task, batch_job_id="batch_abc123")
+        )
+
         task = task_repository.query_by_batch_job_id("batch_abc123")
-        
+
         assert task is not None
         assert task.task_id == sample_task.task_id
         assert task.batch_job_id == "batch_abc123"
-    
+
     def test_query_by_batch_job_id_not_found(self, task_repository):
         """测试未找到任务"""
-        task_repository.table.query = Mock(return_value={"Items": []})
-        
         task = task_repository.query_by_batch_job_id("nonexistent_batch_job")
-        
+
         assert task is None
 
 
+# Decimal 不可变，模块级解析一次即可在测试间复用
+_D_100 = Decimal("100")
+_D_50 = Decimal("50")
+_D_45_2 = Decimal("45.2")
+_D_123_45 = Decimal("123.45")
+_D_1 = Decimal("1")
+_D_2_5 = Decimal("2.5")
+
+
 class TestConvertDecimals:
     """测试 Decimal 转换"""
-    
+
     def test_convert_decimal_to_int(self, task_repository):
         """测试转换 Decimal 为 int"""
-        obj = {"progress": Decimal("100")}
+        obj = {"progress": _D_100}
         result = task_repository._convert_decimals(obj)
         assert result["progress"] == 100
         assert isinstance(result["progress"], int)
-    
+
     def test_convert_decimal_to_float(self, task_repository):
         """测试转换 Decimal 为 float"""
-        obj = {"size_mb": Decimal("45.2")}
+        obj = {"size_mb": _D_45_2}
         result = task_repository._convert_decimals(obj)
         assert result["size_mb"] == 45.2
         assert isinstance(result["size_mb"], float)
-    
+
     def test_convert_nested_decimals(self, task_repository):
         """测试转换嵌套的 Decimal"""
         obj = {
             "task": {
-                "progress": Decimal("50"),
+                "progress": _D_50,
                 "metadata": {
-                    "size": Decimal("123.45")
+                    "size": _D_123_45
                 }
             },
-            "items": [Decimal("1"), Decimal("2.5")]
+            "items": [_D_1, _D_2_5]
         }
-        
+
         result = task_repository._convert_decimals(obj)
-        
+
         assert result["task"]["progress"] == 50
         assert result["task"]["metadata"]["size"] == 123.45
         assert result["items"] == [1, 2.5]
@@ -10,28 +10,84 @@
 
 import pytest
 import numpy as np
+from app.services import vegetation_index_calculator as vic_module
 from app.services.vegetation_index_calculator import VegetationIndexCalculator
 
 
+@pytest.fixture(scope="module")
+def calculator():
+    """创建计算器实例（无状态，模块内共享一个）"""
+    return VegetationIndexCalculator()
+
+
+@pytest.fixture(scope="session")
+def big_bands():
+    """大数组性能测试的输入波段（整个会话只生成一次，测试只读）
+
+    512x512 float32 足以覆盖"大数组不出错"的目的，
+    内存占用比 1000x1000 float64 小 8 倍。
+    固定种子的 PCG64 生成器：可复现，且不依赖 numpy 全局 RNG 状态。
+    """
+    rng = np.random.default_rng(42)
+    size = (512, 512)
+    nir = rng.random(size, dtype=np.float32) * np.float32(0.8) + np.float32(0.2)
+    red = rng.random(size, dtype=np.float32) * np.float32(0.5)
+    green = rng.random(size, dtype=np.float32) * np.float32(0.6)
+    blue = rng.random(size, dtype=np.float32) * np.float32(0.4)
+    return nir, red, green, blue
+
+
+@pytest.fixture(scope="session")
+def jit_warmup():
+    """预热 numba JIT，编译时间不计入具体测试"""
+    calc = VegetationIndexCalculator()
+    tiny = np.zeros((2, 2), dtype=np.float32)
+    calc.calculate_ndvi_fast(tiny, tiny)
+
+
 class TestVegetationIndexCalculator:
     """测试植被指数计算器"""
-    
-    @pytest.fixture
-    def calculator(self):
-        """创建计算器实例"""
-        return VegetationIndexCalculator()
-    
-    # NDVI 测试
-    def test_ndvi_calculation_known_values(self, calculator):
-        """测试 NDVI 计算的已知参考值"""
-        nir = np.array([0.5, 0.6, 0.7])
-        red = np.array([0.2, 0.3, 0.4])
-        expected = np.array([0.42857143, 0.33333333, 0.27272727])
-        
-        result = calculator.calculate_ndvi(nir, red)
-        
-        np.testing.assert_array_almost_equal(result, expected, decimal=6)
-    
+
+    @pytest.fixture(scope="class")
+    def golden_bands(self):
+        """黄金参考输入波段（类内共享，测试只读）"""
+        return {
+            "nir": np.array([0.5, 0.6, 0.7]),
+            "red": np.array([0.2, 0.3, 0.4]),
+            "green": np.array([0.4, 0.5, 0.6]),
+            "blue": np.array([0.1, 0.15, 0.2]),
+        }
+
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    @pytest.mark.parametrize("method, band_names, expected", [
+        # NDVI = (NIR - Red) / (NIR + Red)
+        ("calculate_ndvi", ("nir", "red"),
+         np.array([0.3 / 0.7, 0.3 / 0.9, 0.3 / 1.1])),
+        # SAVI = (1 + 0.5) * (NIR - Red) / (NIR + Red + 0.5)
+        ("calculate_savi", ("nir", "red"),
+         np.array([0.45 / 1.2, 0.45 / 1.4, 0.45 / 1.6])),
+        # EVI = 2.5 * (NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1)
+        ("calculate_evi", ("nir", "red", "blue"),
+         np.array([0.75 / 1.95, 0.75 / 2.275, 0.75 / 2.6])),
+        # VGI = Green / Red
+        ("calculate_vgi", ("green", "red"),
+         np.array([2.0, 0.5 / 0.3, 1.5])),
+    ])
+    def test_index_golden_values(self, calculator, golden_bands,
+                                 method, band_names, expected, dtype):
+        """参数化测试四个指数的已知参考值（共享黄金输入，单次批量断言）
+
+        同时覆盖 float32/float64：生产影像多为 float32，
+        计算器不应把输入悄悄上转成 float64。
+        """
+        result = getattr(calculator, method)(
+            *(np.asarray(golden_bands[name], dtype=dtype)
+              for name in band_names)
+        )
+
+        assert result.dtype == dtype
+        np.testing.assert_allclose(result, expected, atol=1e-6)
+
     def test_ndvi_zero_denominator(self, calculator):
         """测试 NDVI 在分母为零时的处理"""
         nir = np.array([0.0, 0.0, 0.5])
@@ -68,17 +124,6 @@ class TestVegetationIndexCalculator:
         assert result[0, 0] == pytest.approx(0.42857143, rel=1e-6)
     
     # SAVI 测试
-    def test_savi_calculation_default_L(self, calculator):
-        """测试 SAVI 计算（默认 L=0.5）"""
-        nir = np.array([0.5, 0.6, 0.7])
-        red = np.array([0.2, 0.3, 0.4])
-        # SAVI = (1 + 0.5) * (NIR - Red) / (NIR + Red + 0.5)
-        expected = np.array([0.45, 0.375, 0.3125])
-        
-        result = calculator.calculate_savi(nir, red)
-        
-        np.testing.assert_array_almost_equal(result, expected, decimal=6)
-    
     def test_savi_calculation_custom_L(self, calculator):
         """测试 SAVI 计算（自定义 L 值）"""
         nir = np.array([0.5])
@@ -109,33 +154,6 @@ class TestVegetationIndexCalculator:
         assert not np.isnan(result[0])
     
     # EVI 测试
-    def test_evi_calculation_known_values(self, calculator):
-        """测试 EVI 计算的已知参考值"""
-        nir = np.array([0.5])
-        red = np.array([0.2])
-        blue = np.array([0.1])
-        # EVI = 2.5 * (0.5 - 0.2) / (0.5 + 6*0.2 - 7.5*0.1 + 1)
-        # EVI = 2.5 * 0.3 / (0.5 + 1.2 - 0.75 + 1)
-        # EVI = 0.75 / 1.95
-        expected = 0.75 / 1.95
-        
-        result = calculator.calculate_evi(nir, red, blue)
-        
-        assert result[0] == pytest.approx(expected, rel=1e-6)
-    
-    def test_evi_multiple_pixels(self, calculator):
-        """测试 EVI 对多个像素的计算"""
-        nir = np.array([0.5, 0.6, 0.7])
-        red = np.array([0.2, 0.3, 0.4])
-        blue = np.array([0.1, 0.15, 0.2])
-        
-        result = calculator.calculate_evi(nir, red, blue)
-        
-        assert result.shape == (3,)
-        # 验证第一个值
-        expected_0 = 2.5 * (0.5 - 0.2) / (0.5 + 6*0.2 - 7.5*0.1 + 1)
-        assert result[0] == pytest.approx(expected_0, rel=1e-6)
-    
     def test_evi_zero_denominator(self, calculator):
         """测试 EVI 在分母为零时的处理"""
         # 构造一个使分母接近 0 的情况
@@ -161,16 +179,6 @@ class TestVegetationIndexCalculator:
         assert result.shape == (2, 2)
     
     # VGI 测试
-    def test_vgi_calculation_known_values(self, calculator):
-        """测试 VGI 计算的已知参考值"""
-        green = np.array([0.4, 0.5, 0.6])
-        red = np.array([0.2, 0.25, 0.3])
-        expected = np.array([2.0, 2.0, 2.0])
-        
-        result = calculator.calculate_vgi(green, red)
-        
-        np.testing.assert_array_almost_equal(result, expected, decimal=6)
-    
     def test_vgi_zero_denominator(self, calculator):
         """测试 VGI 在分母为零时的处理"""
         green = np.array([0.4, 0.5])
@@ -183,16 +191,6 @@ class TestVegetationIndexCalculator:
         # 第二个值正常计算
         assert result[1] == pytest.approx(2.5, rel=1e-6)
     
-    def test_vgi_various_ratios(self, calculator):
-        """测试 VGI 对不同比值的计算"""
-        green = np.array([0.3, 0.4, 0.5])
-        red = np.array([0.3, 0.2, 0.1])
-        expected = np.array([1.0, 2.0, 5.0])
-        
-        result = calculator.calculate_vgi(green, red)
-        
-        np.testing.assert_array_almost_equal(result, expected, decimal=6)
-    
     # 集成测试
     def test_all_indices_same_input(self, calculator):
         """测试所有指数使用相同输入的计算"""
@@ -200,37 +198,69 @@ class TestVegetationIndexCalculator:
         red = np.array([0.3])
         green = np.array([0.4])
         blue = np.array([0.2])
-        
-        ndvi = calculator.calculate_ndvi(nir, red)
-        savi = calculator.calculate_savi(nir, red)
-        evi = calculator.calculate_evi(nir, red, blue)
-        vgi = calculator.calculate_vgi(green, red)
-        
+
+        results = calculator.calculate_all(nir, red, green=green, blue=blue)
+
         # 所有结果都应该是有效的数值
-        assert not np.isnan(ndvi[0])
-        assert not np.isnan(savi[0])
-        assert not np.isnan(evi[0])
-        assert not np.isnan(vgi[0])
-        
+        assert not np.isnan(results["ndvi"][0])
+        assert not np.isnan(results["savi"][0])
+        assert not np.isnan(results["evi"][0])
+        assert not np.isnan(results["vgi"][0])
+
         # NDVI 应该在 -1 到 1 之间
-        assert -1 <= ndvi[0] <= 1
+        assert -1 <= results["ndvi"][0] <= 1
+
+    def test_calculate_all_matches_individual(self, calculator):
+        """测试融合计算与逐个方法的结果一致"""
+        nir = np.array([0.5, 0.6, 0.7])
+        red = np.array([0.2, 0.3, 0.4])
+        green = np.array([0.4, 0.5, 0.6])
+        blue = np.array([0.1, 0.15, 0.2])
+
+        results = calculator.calculate_all(nir, red, green=green, blue=blue)
+
+        np.testing.assert_array_almost_equal(
+            results["ndvi"], calculator.calculate_ndvi(nir, red), decimal=6)
+        np.testing.assert_array_almost_equal(
+            results["savi"], calculator.calculate_savi(nir, red), decimal=6)
+        np.testing.assert_array_almost_equal(
+            results["evi"], calculator.calculate_evi(nir, red, blue), decimal=6)
+        np.testing.assert_array_almost_equal(
+            results["vgi"], calculator.calculate_vgi(green, red), decimal=6)
     
-    def test_large_array_performance(self, calculator):
+    @pytest.mark.perf
+    @pytest.mark.xdist_group("numpy_heavy")
+    def test_large_array_performance(self, calculator, big_bands, jit_warmup,
+                                     monkeypatch):
         """测试大数组的处理性能"""
-        # 模拟一个 1000x1000 的影像
-        size = (1000, 1000)
-        nir = np.random.rand(*size) * 0.8 + 0.2
-        red = np.random.rand(*size) * 0.5
-        green = np.random.rand(*size) * 0.6
-        blue = np.random.rand(*size) * 0.4
-        
-        # 应该能够快速计算，不抛出异常
-        ndvi = calculator.calculate_ndvi(nir, red)
-        savi = calculator.calculate_savi(nir, red)
-        evi = calculator.calculate_evi(nir, red, blue)
-        vgi = calculator.calculate_vgi(green, red)
-        
+        # 模拟一幅影像（会话级 fixture 共享，只读）
+        nir, red, green, blue = big_bands
+        size = nir.shape
+
+        # 应该能够快速计算，不抛出异常（融合内核：波段只遍历一次）
+        results = calculator.calculate_all(nir, red, green=green, blue=blue)
+        ndvi = results["ndvi"]
+        savi = results["savi"]
+        evi = results["evi"]
+        vgi = results["vgi"]
+
         assert ndvi.shape == size
         assert savi.shape == size
         assert evi.shape == size
         assert vgi.shape == size
+        # float32 输入不应被上转成 float64
+        assert ndvi.dtype == np.float32
+
+        # JIT 变体与禁用 numba 派发后的纯 numpy 参考一致——
+        # 两条独立代码路径互相校验，而非同一路径比较自身
+        ndvi_fast = calculator.calculate_ndvi_fast(nir, red)
+        monkeypatch.setattr(vic_module, "NUMBA_AVAILABLE", False)
+        ndvi_numpy = calculator.calculate_ndvi(nir, red)
+        monkeypatch.undo()
+        np.testing.assert_allclose(ndvi_numpy, ndvi_fast, atol=1e-6)
+
+        # 预分配缓冲区复用：结果写入调用方提供的 out，不再新分配
+        out = np.empty(size, dtype=np.float32)
+        reused = calculator.calculate_ndvi(nir, red, out=out)
+        assert reused is out
+        np.testing.assert_allclose(out, ndvi, atol=1e-6)
@@ -1,235 +1,403 @@
-"""
-植被指数计算器独立测试
-
-直接测试 VegetationIndexCalculator 类，不依赖其他模块
-"""
-
-import sys
-import os
-import pytest
-import numpy as np
-
-# 添加 backend 目录到路径
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-# 直接导入类定义，避免通过 __init__.py
-from app.services.vegetation_index_calculator import VegetationIndexCalculator
-
-
-class TestVegetationIndexCalculatorStandalone:
-    """独立测试植被指数计算器"""
-    
-    @pytest.fixture
-    def calculator(self):
-        """创建计算器实例"""
-        return VegetationIndexCalculator()
-    
-    # NDVI 测试
-    def test_ndvi_formula_correctness(self, calculator):
-        """验证 NDVI 公式: (NIR - Red) / (NIR + Red)"""
-        nir = np.array([0.5, 0.6, 0.7])
-        red = np.array([0.2, 0.3, 0.4])
-        
-        result = calculator.calculate_ndvi(nir, red)
-        
-        # 手动计算期望值
-        expected = (nir - red) / (nir + red)
-        np.testing.assert_array_almost_equal(result, expected, decimal=10)
-    
-    def test_ndvi_known_value(self, calculator):
-        """测试 NDVI 已知值: NIR=0.5, Red=0.2 -> NDVI=0.428571"""
-        nir = np.array([0.5])
-        red = np.array([0.2])
-        
-        result = calculator.calculate_ndvi(nir, red)
-        
-        # (0.5 - 0.2) / (0.5 + 0.2) = 0.3 / 0.7 = 0.428571...
-        assert result[0] == pytest.approx(0.428571428571, rel=1e-9)
-    
-    def test_ndvi_zero_handling(self, calculator):
-        """测试 NDVI 零值处理"""
-        nir = np.array([0.0, 0.5])
-        red = np.array([0.0, 0.2])
-        
-        result = calculator.calculate_ndvi(nir, red)
-        
-        # 第一个: (0-0)/(0+0) = 0/0 -> 应返回 0
-        assert result[0] == 0
-        # 第二个: 正常计算
-        assert result[1] == pytest.approx(0.428571428571, rel=1e-9)
-    
-    # SAVI 测试
-    def test_savi_formula_correctness(self, calculator):
-        """验证 SAVI 公式: (1 + L) * (NIR - Red) / (NIR + Red + L)"""
-        nir = np.array([0.5, 0.6])
-        red = np.array([0.2, 0.3])
-        L = 0.5
-        
-        result = calculator.calculate_savi(nir, red, L=L)
-        
-        # 手动计算期望值
-        expected = (1 + L) * (nir - red) / (nir + red + L)
-        np.testing.assert_array_almost_equal(result, expected, decimal=10)
-    
-    def test_savi_default_L_value(self, calculator):
-        """测试 SAVI 默认 L=0.5"""
-        nir = np.array([0.5])
-        red = np.array([0.2])
-        
-        result = calculator.calculate_savi(nir, red)
-        
-        # (1 + 0.5) * (0.5 - 0.2) / (0.5 + 0.2 + 0.5)
-        # = 1.5 * 0.3 / 1.2 = 0.45 / 1.2 = 0.375
-        assert result[0] == pytest.approx(0.375, rel=1e-9)
-    
-    def test_savi_L_zero_equals_ndvi(self, calculator):
-        """测试 SAVI 当 L=0 时等于 NDVI"""
-        nir = np.array([0.5, 0.6, 0.7])
-        red = np.array([0.2, 0.3, 0.4])
-        
-        savi_L0 = calculator.calculate_savi(nir, red, L=0.0)
-        ndvi = calculator.calculate_ndvi(nir, red)
-        
-        np.testing.assert_array_almost_equal(savi_L0, ndvi, decimal=10)
-    
-    # EVI 测试
-    def test_evi_formula_correctness(self, calculator):
-        """验证 EVI 公式: 2.5 * (NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1)"""
-        nir = np.array([0.5])
-        red = np.array([0.2])
-        blue = np.array([0.1])
-        
-        result = calculator.calculate_evi(nir, red, blue)
-        
-        # 手动计算
-        expected = 2.5 * (nir - red) / (nir + 6*red - 7.5*blue + 1)
-        np.testing.assert_array_almost_equal(result, expected, decimal=10)
-    
-    def test_evi_known_value(self, calculator):
-        """测试 EVI 已知值"""
-        nir = np.array([0.5])
-        red = np.array([0.2])
-        blue = np.array([0.1])
-        
-        result = calculator.calculate_evi(nir, red, blue)
-        
-        # 2.5 * (0.5 - 0.2) / (0.5 + 6*0.2 - 7.5*0.1 + 1)
-        # = 2.5 * 0.3 / (0.5 + 1.2 - 0.75 + 1)
-        # = 0.75 / 1.95
-        # = 0.384615384615...
-        expected = 0.75 / 1.95
-        assert result[0] == pytest.approx(expected, rel=1e-9)
-    
-    def test_evi_multiple_values(self, calculator):
-        """测试 EVI 多个值"""
-        nir = np.array([0.5, 0.6, 0.7])
-        red = np.array([0.2, 0.3, 0.4])
-        blue = np.array([0.1, 0.15, 0.2])
-        
-        result = calculator.calculate_evi(nir, red, blue)
-        
-        # 手动计算每个值
-        for i in range(3):
-            expected = 2.5 * (nir[i] - red[i]) / (nir[i] + 6*red[i] - 7.5*blue[i] + 1)
-            assert result[i] == pytest.approx(expected, rel=1e-9)
-    
-    # VGI 测试
-    def test_vgi_formula_correctness(self, calculator):
-        """验证 VGI 公式: Green / Red"""
-        green = np.array([0.4, 0.5, 0.6])
-        red = np.array([0.2, 0.25, 0.3])
-        
-        result = calculator.calculate_vgi(green, red)
-        
-        # 手动计算期望值
-        expected = green / red
-        np.testing.assert_array_almost_equal(result, expected, decimal=10)
-    
-    def test_vgi_known_values(self, calculator):
-        """测试 VGI 已知值"""
-        green = np.array([0.4, 0.5])
-        red = np.array([0.2, 0.25])
-        
-        result = calculator.calculate_vgi(green, red)
-        
-        assert result[0] == pytest.approx(2.0, rel=1e-9)
-        assert result[1] == pytest.approx(2.0, rel=1e-9)
-    
-    def test_vgi_zero_handling(self, calculator):
-        """测试 VGI 零值处理"""
-        green = np.array([0.4, 0.5])
-        red = np.array([0.0, 0.25])
-        
-        result = calculator.calculate_vgi(green, red)
-        
-        # 第一个: 0.4 / 0.0 -> 应返回 0
-        assert result[0] == 0
-        # 第二个: 正常计算
-        assert result[1] == pytest.approx(2.0, rel=1e-9)
-    
-    # 边界情况测试
-    def test_all_indices_with_2d_arrays(self, calculator):
-        """测试所有指数对 2D 数组的支持"""
-        shape = (3, 4)
-        nir = np.random.rand(*shape) * 0.5 + 0.3
-        red = np.random.rand(*shape) * 0.3 + 0.1
-        green = np.random.rand(*shape) * 0.4 + 0.2
-        blue = np.random.rand(*shape) * 0.2 + 0.05
-        
-        ndvi = calculator.calculate_ndvi(nir, red)
-        savi = calculator.calculate_savi(nir, red)
-        evi = calculator.calculate_evi(nir, red, blue)
-        vgi = calculator.calculate_vgi(green, red)
-        
-        assert ndvi.shape == shape
-        assert savi.shape == shape
-        assert evi.shape == shape
-        assert vgi.shape == shape
-    
-    def test_no_nan_or_inf_in_results(self, calculator):
-        """测试结果中没有 NaN 或 Inf"""
-        nir = np.array([0.5, 0.6, 0.0])
-        red = np.array([0.2, 0.3, 0.0])
-        green = np.array([0.4, 0.5, 0.3])
-        blue = np.array([0.1, 0.15, 0.1])
-        
-        ndvi = calculator.calculate_ndvi(nir, red)
-        savi = calculator.calculate_savi(nir, red)
-        evi = calculator.calculate_evi(nir, red, blue)
-        vgi = calculator.calculate_vgi(green, red)
-        
-        # 所有结果都应该是有限的数值
-        assert np.all(np.isfinite(ndvi))
-        assert np.all(np.isfinite(savi))
-        assert np.all(np.isfinite(evi))
-        assert np.all(np.isfinite(vgi))
-    
-    def test_requirements_validation(self, calculator):
-        """验证需求 5.2, 5.3, 5.4, 5.6"""
-        # 需求 5.2: NDVI = (NIR - Red) / (NIR + Red)
-        nir, red = 0.6, 0.3
-        ndvi = calculator.calculate_ndvi(np.array([nir]), np.array([red]))
-        expected_ndvi = (nir - red) / (nir + red)
-        assert ndvi[0] == pytest.approx(expected_ndvi, rel=1e-9)
-        
-        # 需求 5.3: SAVI = (1 + L) * (NIR - Red) / (NIR + Red + L), L=0.5
-        savi = calculator.calculate_savi(np.array([nir]), np.array([red]))
-        expected_savi = (1 + 0.5) * (nir - red) / (nir + red + 0.5)
-        assert savi[0] == pytest.approx(expected_savi, rel=1e-9)
-        
-        # 需求 5.4: EVI = 2.5 * (NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1)
-        blue = 0.2
-        evi = calculator.calculate_evi(np.array([nir]), np.array([red]), np.array([blue]))
-        expected_evi = 2.5 * (nir - red) / (nir + 6*red - 7.5*blue + 1)
-        assert evi[0] == pytest.approx(expected_evi, rel=1e-9)
-        
-        # 需求 5.6: VGI = Green / Red
-        green = 0.5
-        vgi = calculator.calculate_vgi(np.array([green]), np.array([red]))
-        expected_vgi = green / red
-        assert vgi[0] == pytest.approx(expected_vgi, rel=1e-9)
-
-
-if __name__ == "__main__":
-    # 允许直接运行此文件进行测试
-    pytest.main([__file__, "-v"])
+"""
+植被指数计算器独立测试
+
+直接测试 VegetationIndexCalculator 类，不依赖其他模块
+"""
+
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+import numpy as np
+
+# 添加 backend 目录到路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# 直接导入类定义，避免通过 __init__.py
+from app.services import vegetation_index_calculator as vic_module
+from app.services.vegetation_index_calculator import VegetationIndexCalculator
+
+# 固定种子的 PCG64 生成器：可复现，不经过 numpy 全局 RandomState
+_RNG = np.random.default_rng(0xA6E1)
+
+
+@pytest.fixture(scope="module")
+def bands():
+    """小数组输入波段（模块内共享，测试只读；单元素场景切片取视图即可）"""
+    return SimpleNamespace(
+        nir=np.array([0.5, 0.6, 0.7]),
+        red=np.array([0.2, 0.3, 0.4]),
+        green=np.array([0.4, 0.5, 0.6]),
+        blue=np.array([0.1, 0.15, 0.2]),
+    )
+
+
+class TestVegetationIndexCalculatorStandalone:
+    """独立测试植被指数计算器"""
+    
+    @pytest.fixture(scope="module")
+    def calculator(self):
+        """创建计算器实例（无状态，模块内共享一个；
+        numba 内核在服务模块导入时已预热，构造本身无 JIT 成本）"""
+        return VegetationIndexCalculator()
+    
+    # NDVI 测试
+    def test_ndvi_formula_correctness(self, calculator, bands):
+        """验证 NDVI 公式: (NIR - Red) / (NIR + Red)"""
+        nir, red = bands.nir, bands.red
+
+        result = calculator.calculate_ndvi(nir, red)
+        
+        # 手动计算期望值
+        expected = (nir - red) / (nir + red)
+        np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12)
+    
+    def test_ndvi_known_value(self, calculator, bands):
+        """测试 NDVI 已知值: NIR=0.5, Red=0.2 -> NDVI=0.428571"""
+        result = calculator.calculate_ndvi(bands.nir[:1], bands.red[:1])
+        
+        # (0.5 - 0.2) / (0.5 + 0.2) = 0.3 / 0.7 = 0.428571...
+        assert result[0] == pytest.approx(0.428571428571, rel=1e-9)
+    
+    def test_ndvi_zero_handling(self, calculator):
+        """测试 NDVI 零值处理"""
+        nir = np.array([0.0, 0.5])
+        red = np.array([0.0, 0.2])
+        
+        result = calculator.calculate_ndvi(nir, red)
+        
+        # 第一个: (0-0)/(0+0) = 0/0 -> 应返回 0
+        assert result[0] == 0
+        # 第二个: 正常计算
+        assert result[1] == pytest.approx(0.428571428571, rel=1e-9)
+    
+    # SAVI 测试
+    def test_savi_formula_correctness(self, calculator, bands):
+        """验证 SAVI 公式: (1 + L) * (NIR - Red) / (NIR + Red + L)"""
+        nir, red = bands.nir[:2], bands.red[:2]
+        L = 0.5
+        
+        result = calculator.calculate_savi(nir, red, L=L)
+        
+        # 手动计算期望值
+        expected = (1 + L) * (nir - red) / (nir + red + L)
+        np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12)
+    
+    def test_savi_default_L_value(self, calculator, bands):
+        """测试 SAVI 默认 L=0.5"""
+        result = calculator.calculate_savi(bands.nir[:1], bands.red[:1])
+        
+        # (1 + 0.5) * (0.5 - 0.2) / (0.5 + 0.2 + 0.5)
+        # = 1.5 * 0.3 / 1.2 = 0.45 / 1.2 = 0.375
+        assert result[0] == pytest.approx(0.375, rel=1e-9)
+    
+    def test_savi_L_zero_equals_ndvi(self, calculator, bands):
+        """测试 SAVI 当 L=0 时等于 NDVI"""
+        savi_L0 = calculator.calculate_savi(bands.nir, bands.red, L=0.0)
+        ndvi = calculator.calculate_ndvi(bands.nir, bands.red)
+
+        np.testing.assert_allclose(savi_L0, ndvi, rtol=1e-10, atol=1e-12)
+
+    def test_ndvi_and_savi_fused(self, calculator, bands):
+        """测试单趟融合的 NDVI+SAVI 与逐个计算结果一致"""
+        ndvi, savi = calculator.calculate_ndvi_and_savi(bands.nir, bands.red)
+
+        np.testing.assert_allclose(
+            ndvi, calculator.calculate_ndvi(bands.nir, bands.red),
+            rtol=1e-10, atol=1e-12)
+        np.testing.assert_allclose(
+            savi, calculator.calculate_savi(bands.nir, bands.red),
+            rtol=1e-10, atol=1e-12)
+    
+    # EVI 测试
+    def test_evi_formula_correctness(self, calculator, bands):
+        """验证 EVI 公式: 2.5 * (NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1)"""
+        nir, red, blue = bands.nir[:1], bands.red[:1], bands.blue[:1]
+
+        result = calculator.calculate_evi(nir, red, blue)
+        
+        # 手动计算
+        expected = 2.5 * (nir - red) / (nir + 6*red - 7.5*blue + 1)
+        np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12)
+    
+    def test_evi_known_value(self, calculator, bands):
+        """测试 EVI 已知值"""
+        result = calculator.calculate_evi(
+            bands.nir[:1], bands.red[:1], bands.blue[:1]
+        )
+        
+        # 2.5 * (0.5 - 0.2) / (0.5 + 6*0.2 - 7.5*0.1 + 1)
+        # = 2.5 * 0.3 / (0.5 + 1.2 - 0.75 + 1)
+        # = 0.75 / 1.95
+        # = 0.384615384615...
+        expected = 0.75 / 1.95
+        assert result[0] == pytest.approx(expected, rel=1e-9)
+    
+    def test_evi_multiple_values(self, calculator, bands):
+        """测试 EVI 多个值"""
+        nir, red, blue = bands.nir, bands.red, bands.blue
+
+        result = calculator.calculate_evi(nir, red, blue)
+        
+        # 手动计算每个值
+        for i in range(3):
+            expected = 2.5 * (nir[i] - red[i]) / (nir[i] + 6*red[i] - 7.5*blue[i] + 1)
+            assert result[i] == pytest.approx(expected, rel=1e-9)
+    
+    # VGI 测试
+    def test_vgi_formula_correctness(self, calculator):
+        """验证 VGI 公式: Green / Red"""
+        green = np.array([0.4, 0.5, 0.6])
+        red = np.array([0.2, 0.25, 0.3])
+        
+        result = calculator.calculate_vgi(green, red)
+        
+        # 手动计算期望值
+        expected = green / red
+        np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12)
+    
+    def test_vgi_known_values(self, calculator):
+        """测试 VGI 已知值"""
+        green = np.array([0.4, 0.5])
+        red = np.array([0.2, 0.25])
+        
+        result = calculator.calculate_vgi(green, red)
+        
+        assert result[0] == pytest.approx(2.0, rel=1e-9)
+        assert result[1] == pytest.approx(2.0, rel=1e-9)
+    
+    def test_vgi_zero_handling(self, calculator):
+        """测试 VGI 零值处理"""
+        green = np.array([0.4, 0.5])
+        red = np.array([0.0, 0.25])
+        
+        result = calculator.calculate_vgi(green, red)
+        
+        # 第一个: 0.4 / 0.0 -> 应返回 0
+        assert result[0] == 0
+        # 第二个: 正常计算
+        assert result[1] == pytest.approx(2.0, rel=1e-9)
+    
+    # 边界情况测试
+    def test_all_indices_with_2d_arrays(self, calculator):
+        """测试所有指数对 2D 数组的支持"""
+        shape = (3, 4)
+        nir = _RNG.random(shape) * 0.5 + 0.3
+        red = _RNG.random(shape) * 0.3 + 0.1
+        green = _RNG.random(shape) * 0.4 + 0.2
+        blue = _RNG.random(shape) * 0.2 + 0.05
+        
+        ndvi = calculator.calculate_ndvi(nir, red)
+        savi = calculator.calculate_savi(nir, red)
+        evi = calculator.calculate_evi(nir, red, blue)
+        vgi = calculator.calculate_vgi(green, red)
+        
+        assert ndvi.shape == shape
+        assert savi.shape == shape
+        assert evi.shape == shape
+        assert vgi.shape == shape
+    
+    def test_out_buffer_reuse(self, bands):
+        """测试 out= 配合 get_buffer 复用输出缓冲区"""
+        # 用独立实例，避免给模块级共享实例留下缓存的缓冲区
+        calc = VegetationIndexCalculator()
+        shape = bands.nir.shape
+        buffer = calc.get_buffer(shape)
+
+        # 同一 (shape, dtype) 拿到的是同一块缓冲区
+        assert calc.get_buffer(shape) is buffer
+
+        result = calc.calculate_ndvi(bands.nir, bands.red, out=buffer)
+        assert result is buffer
+        expected = (bands.nir - bands.red) / (bands.nir + bands.red)
+        np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12)
+
+        # 复用同一缓冲区计算另一个指数，结果被覆盖
+        result = calc.calculate_vgi(bands.green, bands.red, out=buffer)
+        assert result is buffer
+        np.testing.assert_allclose(
+            result, bands.green / bands.red, rtol=1e-10, atol=1e-12)
+
+        calc.clear_buffers()
+        assert calc.get_buffer(shape) is not buffer
+
+    def test_float32_path_preserves_dtype(self, calculator):
+        """测试 float32 输入不被上转成 float64
+
+        实际卫星影像多为 16 位整型或 float32；保持 float32 计算
+        可以减半内存流量，也避免中间表达式悄悄升格精度。
+        """
+        shape = (3, 4)
+        nir = _RNG.random(shape, dtype=np.float32)
+        red = _RNG.random(shape, dtype=np.float32)
+        green = _RNG.random(shape, dtype=np.float32)
+        blue = _RNG.random(shape, dtype=np.float32)
+
+        assert calculator.calculate_ndvi(nir, red).dtype == np.float32
+        assert calculator.calculate_savi(nir, red).dtype == np.float32
+        assert calculator.calculate_evi(nir, red, blue).dtype == np.float32
+        assert calculator.calculate_vgi(green, red).dtype == np.float32
+
+    def test_scalar_fast_path_matches_array_path(self, calculator, bands):
+        """测试标量快路径与数组路径结果一致
+
+        标量输入走纯 Python 算术，不构造单元素数组；
+        两条路径必须逐指数给出相同的值。
+        """
+        nir, red = bands.nir[0], bands.red[0]
+        green, blue = bands.green[0], bands.blue[0]
+
+        scalar_ndvi = calculator.calculate_ndvi(float(nir), float(red))
+        assert isinstance(scalar_ndvi, float)
+        assert scalar_ndvi == pytest.approx(
+            calculator.calculate_ndvi(bands.nir[:1], bands.red[:1])[0],
+            rel=1e-12)
+
+        scalar_savi = calculator.calculate_savi(float(nir), float(red))
+        assert scalar_savi == pytest.approx(
+            calculator.calculate_savi(bands.nir[:1], bands.red[:1])[0],
+            rel=1e-12)
+
+        scalar_evi = calculator.calculate_evi(float(nir), float(red), float(blue))
+        assert scalar_evi == pytest.approx(
+            calculator.calculate_evi(
+                bands.nir[:1], bands.red[:1], bands.blue[:1])[0],
+            rel=1e-12)
+
+        scalar_vgi = calculator.calculate_vgi(float(green), float(red))
+        assert scalar_vgi == pytest.approx(
+            calculator.calculate_vgi(bands.green[:1], bands.red[:1])[0],
+            rel=1e-12)
+
+        # 零分母的标量输入与数组路径同样返回 0
+        assert calculator.calculate_ndvi(0.0, 0.0) == 0.0
+        assert calculator.calculate_vgi(0.4, 0.0) == 0.0
+
+    def test_nan_propagates_on_kernel_path(self, calculator, monkeypatch):
+        """测试 NaN nodata 在内核路径与 numpy 路径中同样传播
+
+        fastmath 不得带 nnan 假设：含 NaN 的像元必须保持 NaN，
+        不能在内核路径上被悄悄写成 0。
+        """
+        nir = np.array([np.nan, 0.5, 0.0])
+        red = np.array([0.2, np.nan, 0.0])
+        green = np.array([np.nan, 0.5, 0.0])
+        blue = np.array([0.1, 0.1, np.nan])
+
+        kernel = {
+            "ndvi": calculator.calculate_ndvi(nir, red),
+            "savi": calculator.calculate_savi(nir, red),
+            "evi": calculator.calculate_evi(nir, red, blue),
+            "vgi": calculator.calculate_vgi(green, red),
+        }
+
+        monkeypatch.setattr(vic_module, "NUMBA_AVAILABLE", False)
+        reference = {
+            "ndvi": calculator.calculate_ndvi(nir, red),
+            "savi": calculator.calculate_savi(nir, red),
+            "evi": calculator.calculate_evi(nir, red, blue),
+            "vgi": calculator.calculate_vgi(green, red),
+        }
+
+        for name in kernel:
+            np.testing.assert_array_equal(
+                np.isnan(kernel[name]), np.isnan(reference[name]),
+                err_msg=f"{name} NaN 传播与 numpy 路径不一致")
+        # 含 NaN 输入的像元保持 NaN，全零像元仍按除零保护写 0
+        assert np.isnan(kernel["vgi"][0]) and np.isnan(kernel["vgi"][1])
+        assert kernel["vgi"][2] == 0
+
+    def test_integer_band_input(self, calculator, monkeypatch):
+        """测试整型波段输入（卫星 DN 常见 uint16）
+
+        整型数组进不了浮点内核，必须安全落到 numpy 路径并返回浮点结果，
+        不能因整型输出缓冲区让 np.divide 抛 UFuncTypeError。
+        """
+        nir = np.array([[4000, 0], [3000, 2000]], dtype=np.uint16)
+        red = np.array([[2000, 0], [1000, 1000]], dtype=np.uint16)
+        green = np.array([[4000, 0], [3000, 2000]], dtype=np.uint16)
+
+        vgi = calculator.calculate_vgi(green, red)
+        assert np.issubdtype(vgi.dtype, np.floating)
+        np.testing.assert_allclose(
+            vgi, [[2.0, 0.0], [3.0, 2.0]], rtol=1e-6, atol=1e-9)
+
+        ndvi = calculator.calculate_ndvi(nir, red)
+        assert np.issubdtype(ndvi.dtype, np.floating)
+        np.testing.assert_allclose(
+            ndvi, [[1 / 3, 0.0], [0.5, 1 / 3]], rtol=1e-6, atol=1e-9)
+
+        results = calculator.calculate_all(nir, red, green=green)
+        np.testing.assert_allclose(
+            results["ndvi"], ndvi, rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(
+            results["vgi"], vgi, rtol=1e-6, atol=1e-9)
+
+        fused_ndvi, fused_savi = calculator.calculate_ndvi_and_savi(nir, red)
+        np.testing.assert_allclose(
+            fused_ndvi, ndvi, rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(
+            fused_savi, calculator.calculate_savi(
+                nir.astype(np.float64), red.astype(np.float64)),
+            rtol=1e-6, atol=1e-9)
+
+        # numba 不可用时 NDVI 走纯 numpy 安全路径，同样不得崩、不得返回整型
+        monkeypatch.setattr(vic_module, "NUMBA_AVAILABLE", False)
+        ndvi_numpy = calculator.calculate_ndvi(nir, red)
+        assert np.issubdtype(ndvi_numpy.dtype, np.floating)
+        np.testing.assert_allclose(ndvi_numpy, ndvi, rtol=1e-6, atol=1e-9)
+
+    def test_no_nan_or_inf_in_results(self, calculator):
+        """测试结果中没有 NaN 或 Inf"""
+        nir = np.array([0.5, 0.6, 0.0])
+        red = np.array([0.2, 0.3, 0.0])
+        green = np.array([0.4, 0.5, 0.3])
+        blue = np.array([0.1, 0.15, 0.1])
+        
+        ndvi = calculator.calculate_ndvi(nir, red)
+        savi = calculator.calculate_savi(nir, red)
+        evi = calculator.calculate_evi(nir, red, blue)
+        vgi = calculator.calculate_vgi(green, red)
+        
+        # 所有结果都应该是有限的数值
+        assert np.all(np.isfinite(ndvi))
+        assert np.all(np.isfinite(savi))
+        assert np.all(np.isfinite(evi))
+        assert np.all(np.isfinite(vgi))
+    
+    def test_requirements_validation(self, calculator):
+        """验证需求 5.2, 5.3, 5.4, 5.6
+
+        四个指数经 calculate_all 一次融合调用得到：
+        单元素数组上每次调用的派发开销远大于算术本身，
+        批量路径只派发一次，且 NIR+Red 只算一遍。
+        """
+        nir, red, green, blue = 0.6, 0.3, 0.5, 0.2
+        results = calculator.calculate_all(
+            np.array([nir]),
+            np.array([red]),
+            green=np.array([green]),
+            blue=np.array([blue])
+        )
+
+        # 需求 5.2: NDVI = (NIR - Red) / (NIR + Red)
+        expected_ndvi = (nir - red) / (nir + red)
+        assert results["ndvi"][0] == pytest.approx(expected_ndvi, rel=1e-9)
+
+        # 需求 5.3: SAVI = (1 + L) * (NIR - Red) / (NIR + Red + L), L=0.5
+        expected_savi = (1 + 0.5) * (nir - red) / (nir + red + 0.5)
+        assert results["savi"][0] == pytest.approx(expected_savi, rel=1e-9)
+
+        # 需求 5.4: EVI = 2.5 * (NIR - Red) / (NIR + 6*Red - 7.5*Blue + 1)
+        expected_evi = 2.5 * (nir - red) / (nir + 6*red - 7.5*blue + 1)
+        assert results["evi"][0] == pytest.approx(expected_evi, rel=1e-9)
+
+        # 需求 5.6: VGI = Green / Red
+        expected_vgi = green / red
+        assert results["vgi"][0] == pytest.approx(expected_vgi, rel=1e-9)
+
+
+if __name__ == "__main__":
+    # 允许直接运行此文件进行测试
+    pytest.main([__file__, "-v"])
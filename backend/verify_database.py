@@ -15,6 +15,7 @@ Example:
 import os
 import sys
 import boto3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from botocore.exceptions import ClientError
 
@@ -39,6 +40,17 @@ def print_info(message):
     print(f"{Colors.YELLOW}ℹ {message}{Colors.NC}")
 
 
+def _pk_sk(key_schema):
+    """Extract (partition key, sort key) attribute names in one pass."""
+    pk = sk = None
+    for key in key_schema:
+        if key["KeyType"] == "HASH":
+            pk = key["AttributeName"]
+        elif key["KeyType"] == "RANGE":
+            sk = key["AttributeName"]
+    return pk, sk
+
+
 def verify_database(environment="dev", region="us-east-1"):
     """Verify DynamoDB database configuration"""
     
@@ -58,11 +70,22 @@ def verify_database(environment="dev", region="us-east-1"):
     table = dynamodb_resource.Table(table_name)
     
     verification_passed = True
-    
+
+    # Issue the two independent describe calls together: each one is a full
+    # round trip to AWS, so overlapping them halves the setup-phase wall time.
+    # boto3 clients are thread-safe for reads.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        describe_future = executor.submit(
+            dynamodb_client.describe_table, TableName=table_name
+        )
+        ttl_future = executor.submit(
+            dynamodb_client.describe_time_to_live, TableName=table_name
+        )
+
     # 1. Check if table exists
     print("1. Checking if table exists...")
     try:
-        response = dynamodb_client.describe_table(TableName=table_name)
+        response = describe_future.result()
         if response["Table"]["TableStatus"] == "ACTIVE":
             print_success(f"Table '{table_name}' exists and is ACTIVE")
         else:
@@ -80,17 +103,15 @@ def verify_database(environment="dev", region="us-east-1"):
     
     # 2. Verify primary key configuration
     print("\n2. Verifying primary key configuration...")
-    key_schema = response["Table"]["KeySchema"]
-    
-    partition_key = next((k for k in key_schema if k["KeyType"] == "HASH"), None)
-    if partition_key and partition_key["AttributeName"] == "task_id":
+    partition_key, sort_key = _pk_sk(response["Table"]["KeySchema"])
+
+    if partition_key == "task_id":
         print_success("Partition key is 'task_id'")
     else:
         print_error(f"Partition key is incorrect: {partition_key}")
         verification_passed = False
-    
-    sort_key = next((k for k in key_schema if k["KeyType"] == "RANGE"), None)
-    if sort_key and sort_key["AttributeName"] == "created_at":
+
+    if sort_key == "created_at":
         print_success("Sort key is 'created_at'")
     else:
         print_error(f"Sort key is incorrect: {sort_key}")
@@ -104,10 +125,8 @@ def verify_database(environment="dev", region="us-east-1"):
     status_index = next((idx for idx in gsi_list if idx["IndexName"] == "StatusIndex"), None)
     if status_index:
         print_success("StatusIndex exists")
-        key_schema = status_index["KeySchema"]
-        pk = next((k for k in key_schema if k["KeyType"] == "HASH"), None)
-        sk = next((k for k in key_schema if k["KeyType"] == "RANGE"), None)
-        if pk["AttributeName"] == "status" and sk["AttributeName"] == "created_at":
+        pk, sk = _pk_sk(status_index["KeySchema"])
+        if pk == "status" and sk == "created_at":
             print_success("  - Keys: status (PK), created_at (SK)")
         else:
             print_error(f"  - Keys are incorrect")
@@ -120,9 +139,8 @@ def verify_database(environment="dev", region="us-east-1"):
     batch_index = next((idx for idx in gsi_list if idx["IndexName"] == "BatchJobIndex"), None)
     if batch_index:
         print_success("BatchJobIndex exists")
-        key_schema = batch_index["KeySchema"]
-        pk = next((k for k in key_schema if k["KeyType"] == "HASH"), None)
-        if pk["AttributeName"] == "batch_job_id":
+        pk, _ = _pk_sk(batch_index["KeySchema"])
+        if pk == "batch_job_id":
             print_success("  - Key: batch_job_id (PK)")
         else:
             print_error(f"  - Key is incorrect")
@@ -135,10 +153,8 @@ def verify_database(environment="dev", region="us-east-1"):
     user_index = next((idx for idx in gsi_list if idx["IndexName"] == "UserIndex"), None)
     if user_index:
         print_success("UserIndex exists")
-        key_schema = user_index["KeySchema"]
-        pk = next((k for k in key_schema if k["KeyType"] == "HASH"), None)
-        sk = next((k for k in key_schema if k["KeyType"] == "RANGE"), None)
-        if pk["AttributeName"] == "user_id" and sk["AttributeName"] == "created_at":
+        pk, sk = _pk_sk(user_index["KeySchema"])
+        if pk == "user_id" and sk == "created_at":
             print_success("  - Keys: user_id (PK), created_at (SK)")
         else:
             print_error(f"  - Keys are incorrect")
@@ -150,7 +166,7 @@ def verify_database(environment="dev", region="us-east-1"):
     # 4. Verify TTL configuration
     print("\n4. Verifying TTL configuration...")
     try:
-        ttl_response = dynamodb_client.describe_time_to_live(TableName=table_name)
+        ttl_response = ttl_future.result()
         ttl_desc = ttl_response["TimeToLiveDescription"]
         ttl_status = ttl_desc["TimeToLiveStatus"]
         
@@ -174,41 +190,68 @@ def verify_database(environment="dev", region="us-east-1"):
     # 5. Test basic read/write operations
     print("\n5. Testing basic read/write operations...")
     
-    test_task_id = f"test-task-{int(datetime.now(timezone.utc).timestamp())}"
-    test_created_at = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
-    test_expires_at = int((datetime.now(timezone.utc) + timedelta(days=30)).timestamp())
-    test_batch_job_id = f"test-batch-job-{int(datetime.now(timezone.utc).timestamp())}"
+    # One clock read for all four derived values: cheaper, and the task id,
+    # timestamp and batch job id can never straddle a second boundary.
+    now = datetime.now(timezone.utc)
+    now_ts = int(now.timestamp())
+    test_task_id = f"test-task-{now_ts}"
+    test_created_at = now.isoformat().replace('+00:00', 'Z')
+    test_expires_at = int((now + timedelta(days=30)).timestamp())
+    test_batch_job_id = f"test-batch-job-{now_ts}"
     
-    # Write test item
+    # Write test item. batch_writer coalesces up to 25 writes per round trip,
+    # so a future multi-environment or multi-item loop stays at O(1) RTTs;
+    # the block flushes on exit, before the reads below run.
     print_info("Writing test item...")
     try:
-        table.put_item(
-            Item={
-                "task_id": test_task_id,
-                "created_at": test_created_at,
-                "status": "queued",
-                "task_type": "test",
-                "user_id": "test-user",
-                "batch_job_id": test_batch_job_id,
-                "expiresAt": test_expires_at,
-                "parameters": {},
-            }
-        )
+        with table.batch_writer() as batch:
+            batch.put_item(
+                Item={
+                    "task_id": test_task_id,
+                    "created_at": test_created_at,
+                    "status": "queued",
+                    "task_type": "test",
+                    "user_id": "test-user",
+                    "batch_job_id": test_batch_job_id,
+                    "expiresAt": test_expires_at,
+                    "parameters": {},
+                }
+            )
         print_success("Successfully wrote test item")
     except ClientError as e:
         print_error(f"Failed to write test item: {e}")
         verification_passed = False
         return verification_passed
     
-    # Read test item
-    print_info("Reading test item...")
-    try:
-        response = table.get_item(
+    # The three reads below only depend on the item just written, not on each
+    # other — run them concurrently and report the results in order.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        get_future = executor.submit(
+            table.get_item,
             Key={
                 "task_id": test_task_id,
                 "created_at": test_created_at,
-            }
+            },
+        )
+        status_query_future = executor.submit(
+            table.query,
+            IndexName="StatusIndex",
+            KeyConditionExpression="#status = :status",
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={":status": "queued"},
+            Limit=10,
+        )
+        batch_query_future = executor.submit(
+            table.query,
+            IndexName="BatchJobIndex",
+            KeyConditionExpression="batch_job_id = :batch_job_id",
+            ExpressionAttributeValues={":batch_job_id": test_batch_job_id},
         )
+
+    # Read test item
+    print_info("Reading test item...")
+    try:
+        response = get_future.result()
         if "Item" in response and response["Item"]["task_id"] == test_task_id:
             print_success("Successfully read test item")
         else:
@@ -221,13 +264,7 @@ def verify_database(environment="dev", region="us-east-1"):
     # Query by status
     print_info("Querying by status using StatusIndex...")
     try:
-        response = table.query(
-            IndexName="StatusIndex",
-            KeyConditionExpression="#status = :status",
-            ExpressionAttributeNames={"#status": "status"},
-            ExpressionAttributeValues={":status": "queued"},
-            Limit=10,
-        )
+        response = status_query_future.result()
         if response["Count"] > 0:
             print_success(f"Successfully queried by status (found {response['Count']} items)")
         else:
@@ -240,11 +277,7 @@ def verify_database(environment="dev", region="us-east-1"):
     # Query by batch_job_id
     print_info("Querying by batch_job_id using BatchJobIndex...")
     try:
-        response = table.query(
-            IndexName="BatchJobIndex",
-            KeyConditionExpression="batch_job_id = :batch_job_id",
-            ExpressionAttributeValues={":batch_job_id": test_batch_job_id},
-        )
+        response = batch_query_future.result()
         if response["Count"] > 0:
             print_success(f"Successfully queried by batch_job_id (found {response['Count']} items)")
         else:
@@ -277,12 +310,13 @@ def verify_database(environment="dev", region="us-east-1"):
     # Delete test item (cleanup)
     print_info("Deleting test item...")
     try:
-        table.delete_item(
-            Key={
-                "task_id": test_task_id,
-                "created_at": test_created_at,
-            }
-        )
+        with table.batch_writer() as batch:
+            batch.delete_item(
+                Key={
+                    "task_id": test_task_id,
+                    "created_at": test_created_at,
+                }
+            )
         print_success("Successfully deleted test item")
     except ClientError as e:
         print_error(f"Failed to delete test item: {e}")